@@ -0,0 +1,130 @@
+import functools
+import inspect
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Sequence, TypeVar, cast
+
+import pygame
+
+T = TypeVar("T")
+MethodT = TypeVar("MethodT", bound=Callable[..., Any])
+
+
+def estimate_size(value: Any) -> int:
+    # rough bytes held by a loaded asset
+    if isinstance(value, pygame.Surface):
+        return value.get_width() * value.get_height() * value.get_bytesize()
+    if isinstance(value, pygame.mixer.Sound):
+        frequency, size, channels = pygame.mixer.get_init() or (0, 0, 0)
+        return int(value.get_length() * frequency * channels * abs(size) // 8)
+    if isinstance(value, dict):
+        mapping = cast(dict[Any, Any], value)
+        return sys.getsizeof(mapping) + sum(
+            estimate_size(key) + estimate_size(item) for key, item in mapping.items()
+        )
+    if isinstance(value, (list, tuple)):
+        items = cast(Sequence[Any], value)
+        return sys.getsizeof(items) + sum(estimate_size(item) for item in items)
+    return sys.getsizeof(value)
+
+
+class AssetCache:
+    # least recently used assets of one kind, kept under a byte budget.
+    # Assets whose path is pinned are never evicted. Assets are loaded outside the lock,
+    # so the loader thread and the main thread only wait on each other for bookkeeping.
+    def __init__(
+        self,
+        budget: int | None = None,
+        pinned: frozenset[str] = frozenset(),
+    ) -> None:
+        self.budget = budget
+        self.pinned = pinned
+        self.entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.sizes: dict[Hashable, int] = {}
+        self.pinned_keys: set[Hashable] = set()
+        self.size = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self.lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key: Hashable, path: Any, load: Callable[[], T]) -> T:
+        with self.lock:
+            if key in self.entries:
+                self.stats["hits"] += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.stats["misses"] += 1
+        value = load()
+        with self.lock:
+            # another thread may have loaded it in the meantime
+            if key in self.entries:
+                return self.entries[key]
+            self.entries[key] = value
+            self.sizes[key] = estimate_size(value)
+            self.size += self.sizes[key]
+            if path in self.pinned:
+                self.pinned_keys.add(key)
+            self.evict()
+        return value
+
+    def evict(self) -> None:
+        if self.budget is None:
+            return
+        for key in list(self.entries):
+            if self.size <= self.budget:
+                break
+            if key in self.pinned_keys:
+                continue
+            del self.entries[key]
+            self.size -= self.sizes.pop(key)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.pinned_keys.clear()
+            self.size = 0
+
+    def report(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                **self.stats,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "budget": -1 if self.budget is None else self.budget,
+            }
+
+
+@functools.cache
+def signature(method: Callable[..., Any]) -> inspect.Signature:
+    return inspect.signature(method)
+
+
+def cache_key(
+    method: Callable[..., Any], args: tuple[Any, ...], kwargs: dict[str, Any]
+) -> Hashable:
+    # the same call spelled differently, by keyword or leaving out defaults, shares a key
+    bound = signature(method).bind(None, *args, **kwargs)
+    bound.apply_defaults()
+    return (method.__name__, *tuple(bound.arguments.values())[1:])
+
+
+def cached(kind: str) -> Callable[[MethodT], MethodT]:
+    # stores a loader method's results in the loader's cache for that kind of asset
+    def decorator(method: MethodT) -> MethodT:
+        @functools.wraps(method)
+        def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+            key = cache_key(method, args, kwargs)
+            path = args[0] if args else kwargs.get("path")
+            return self.caches[kind].get(
+                key, path, lambda: method(self, *args, **kwargs)
+            )
+
+        return wrapper  # type: ignore
+
+    return decorator
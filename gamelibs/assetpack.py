@@ -0,0 +1,130 @@
+import mmap
+import os
+import pathlib
+import struct
+from typing import Iterator
+
+# single file archive of the small game files, read through a memory map.
+# Layout, all little endian:
+#   header: magic, version, entry count
+#   index: one entry per file, followed by its path relative to the game folder
+#   data: the files back to back, at the offsets given in the index
+PACK_NAME = "assets.pack"
+MAGIC = b"GPAK"
+VERSION = 1
+HEADER = struct.Struct("<4sHI")
+# offset, length, kind, mtime, path length
+ENTRY = struct.Struct("<QQBdH")
+
+KIND_IMAGE = 0
+KIND_JSON = 1
+KIND_CSV = 2
+KIND_SCRIPT = 3
+KIND_SHADER = 4
+KINDS = {
+    ".png": KIND_IMAGE,
+    ".json": KIND_JSON,
+    ".csv": KIND_CSV,
+    ".snek": KIND_SCRIPT,
+    ".vert": KIND_SHADER,
+    ".frag": KIND_SHADER,
+    ".glsl": KIND_SHADER,
+}
+# saves are written while the game runs, so they always come from disk
+FOLDERS = ("assets", "data", "cutscenes", "scripts", "shaders")
+SKIPPED = ("data/saves",)
+
+
+def pack_key(path: pathlib.Path) -> str:
+    return pathlib.Path(path).as_posix()
+
+
+def walk(base: pathlib.Path) -> Iterator[pathlib.Path]:
+    for folder in FOLDERS:
+        for path in sorted((base / folder).rglob("*")):
+            key = pack_key(path.relative_to(base))
+            if path.is_file() and path.suffix in KINDS and not key.startswith(SKIPPED):
+                yield path
+
+
+def build(base: pathlib.Path, output: pathlib.Path) -> int:
+    paths = list(walk(base))
+    keys = [pack_key(path.relative_to(base)).encode() for path in paths]
+    offset = HEADER.size + sum(ENTRY.size + len(key) for key in keys)
+    index: list[bytes] = []
+    for path, key in zip(paths, keys):
+        stat = path.stat()
+        index.append(
+            ENTRY.pack(
+                offset, stat.st_size, KINDS[path.suffix], stat.st_mtime, len(key)
+            )
+        )
+        index.append(key)
+        offset += stat.st_size
+    with output.open("wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(paths)))
+        file.writelines(index)
+        for path in paths:
+            file.write(path.read_bytes())
+    return len(paths)
+
+
+class AssetPack:
+    def __init__(self, path: pathlib.Path) -> None:
+        with path.open("rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        try:
+            magic, version, count = HEADER.unpack_from(self.map)
+        except struct.error:
+            raise ValueError(f"{path} is too short to be an asset pack")
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} asset pack")
+        self.entries: dict[str, tuple[int, int, int, float]] = {}
+        offset = HEADER.size
+        for _ in range(count):
+            if offset + ENTRY.size > len(self.map):
+                raise ValueError(f"{path} has a truncated index")
+            start, length, kind, mtime, key_length = ENTRY.unpack_from(self.map, offset)
+            offset += ENTRY.size
+            if start + length > len(self.map) or offset + key_length > len(self.map):
+                raise ValueError(f"{path} is truncated")
+            key = bytes(self.view[offset : offset + key_length]).decode()
+            offset += key_length
+            self.entries[key] = (start, length, kind, mtime)
+
+    @classmethod
+    def open(cls, path: pathlib.Path, check_stale: bool = False) -> "AssetPack | None":
+        if not path.exists():
+            return None
+        try:
+            pack = cls(path)
+        except ValueError as error:
+            print("WARNING:", error)
+            return None
+        if check_stale:
+            pack.drop_stale(path.parent)
+        return pack
+
+    def drop_stale(self, base: pathlib.Path) -> None:
+        # files edited since packing are read from disk instead.
+        # A stat per packed file, so only done while developing.
+        for key, (_, _, _, mtime) in list(self.entries.items()):
+            try:
+                if os.stat(base / key).st_mtime != mtime:
+                    del self.entries[key]
+            except FileNotFoundError:
+                pass
+
+    def read(self, path: pathlib.Path) -> memoryview | None:
+        # slice of the pack, or None when the file is not packed
+        entry = self.entries.get(pack_key(path))
+        if entry is None:
+            return None
+        start, length, _, _ = entry
+        return self.view[start : start + length]
+
+
+if __name__ == "__main__":
+    count = build(pathlib.Path("."), pathlib.Path(PACK_NAME))
+    print(f"packed {count} files into {PACK_NAME}")
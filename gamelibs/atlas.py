@@ -0,0 +1,105 @@
+import weakref
+from typing import Callable, Iterable
+
+import pygame
+from pygame.typing import Point
+
+ATLAS_PAGE_SIZE = 512
+# blank pixels around each frame so a GPU sampling one frame never reads its neighbour
+ATLAS_PADDING = 1
+
+
+class Atlas:
+    # spritesheet frames packed onto a few large pages, handed out as subsurface views.
+    # Frames are packed in rows (shelves) left to right, a new row starts when one is full
+    # and a new page when a page is. Frames with identical pixels share the same spot,
+    # so frames are read-only: drawing on one draws on every frame that shares it.
+    # Copy a frame before changing its pixels.
+    def __init__(
+        self,
+        create_page: Callable[[Point], pygame.Surface],
+        page_size: int = ATLAS_PAGE_SIZE,
+        padding: int = ATLAS_PADDING,
+    ) -> None:
+        self.create_page = create_page
+        self.page_size = page_size
+        self.padding = padding
+        self.pages: list[pygame.Surface] = []
+        # the page being filled, where its next frame goes and the height of its current row
+        self.shelf_page: int | None = None
+        self.x = 0
+        self.y = 0
+        self.shelf_height = 0
+        self.placed: dict[tuple[int, int, bytes], tuple[int, pygame.Rect]] = {}
+        # weak, so frames whose spritesheet was evicted and are unused get freed
+        self.frames: weakref.WeakKeyDictionary[
+            pygame.Surface, tuple[int, pygame.Rect]
+        ] = weakref.WeakKeyDictionary()
+        # bytes the frames would take as separate surfaces
+        self.unpacked_bytes = 0
+
+    def new_page(self, size: Point) -> int:
+        self.pages.append(self.create_page(size))
+        return len(self.pages) - 1
+
+    def place(self, size: Point) -> tuple[int, pygame.Rect]:
+        width = size[0] + self.padding
+        height = size[1] + self.padding
+        if width > self.page_size or height > self.page_size:
+            # too big to share a page
+            return self.new_page(size), pygame.Rect((0, 0), size)
+        if self.x + width > self.page_size:
+            self.x = 0
+            self.y += self.shelf_height
+            self.shelf_height = 0
+        if self.shelf_page is None or self.y + height > self.page_size:
+            self.shelf_page = self.new_page((self.page_size, self.page_size))
+            self.x = self.y = self.shelf_height = 0
+        rect = pygame.Rect((self.x, self.y), size)
+        self.x += width
+        self.shelf_height = max(self.shelf_height, height)
+        return self.shelf_page, rect
+
+    def add(self, frame: pygame.Surface) -> pygame.Surface:
+        key = (
+            frame.get_width(),
+            frame.get_height(),
+            pygame.image.tobytes(frame, "RGBA"),
+        )
+        if key not in self.placed:
+            page, rect = self.place(frame.get_size())
+            self.pages[page].blit(frame, rect)
+            self.placed[key] = page, rect
+        page, rect = self.placed[key]
+        view = self.pages[page].subsurface(rect)
+        self.frames[view] = page, rect
+        self.unpacked_bytes += (
+            frame.get_width() * frame.get_height() * frame.get_bytesize()
+        )
+        return view
+
+    def add_all(self, frames: Iterable[pygame.Surface]) -> tuple[pygame.Surface, ...]:
+        return tuple(self.add(frame) for frame in frames)
+
+    def uv_rect(self, view: pygame.Surface) -> tuple[int, pygame.FRect]:
+        # page index and the frame's area on it, scaled to 0-1 for texture lookups
+        page, rect = self.frames[view]
+        page_width, page_height = self.pages[page].get_size()
+        return page, pygame.FRect(
+            rect.x / page_width,
+            rect.y / page_height,
+            rect.width / page_width,
+            rect.height / page_height,
+        )
+
+    def report(self) -> dict[str, int]:
+        return {
+            "frames": len(self.frames),
+            "unique_frames": len(self.placed),
+            "pages": len(self.pages),
+            "bytes_before": self.unpacked_bytes,
+            "bytes_after": sum(
+                page.get_width() * page.get_height() * page.get_bytesize()
+                for page in self.pages
+            ),
+        }
@@ -1,3 +1,4 @@
+import os
 import sys
 import platform
 import json
@@ -5,6 +6,8 @@ from typing import Any
 from gamelibs import interfaces
 
 PYGBAG = sys.platform == "emscripten"
+# set GEMINI_DEV while editing assets, so files newer than the asset pack are used
+DEV = bool(os.environ.get("GEMINI_DEV"))
 HTML_WINDOW = None
 
 settings: dict[str, Any] = {}
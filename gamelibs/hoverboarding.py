@@ -183,6 +183,7 @@ class ScrollingBackground(sprite.Sprite, interfaces.Background):
 
 class Player(sprite.Sprite, interfaces.HoverboardPlayer):
     groups = {"interactable", "player"}
+    always_active = True
 
     BANK_SPEED = 82
     ACCEL_SPEED = 48
@@ -338,9 +339,10 @@ class Player(sprite.Sprite, interfaces.HoverboardPlayer):
                     self.rect.x = max(self.min_x, self.rect.x - self.ACCEL_SPEED * dt)
                     self.state = "lookback"
                     self._facing = interfaces.Direction.LEFT
+                collision_rect = self.collision_rect
                 if (
-                    self.collision_rect.collidelist(
-                        self.get_level().get_rects("collision")
+                    collision_rect.collidelist(
+                        self.get_level().query_rects("collision", collision_rect)
                     )
                     != -1
                 ):
@@ -355,6 +357,7 @@ class Player(sprite.Sprite, interfaces.HoverboardPlayer):
 
 class DeadPlayer(sprite.Sprite):
     groups = {"dead-player"}
+    always_active = True
 
     def __init__(
         self,
@@ -382,6 +385,7 @@ class DeadPlayer(sprite.Sprite):
 
 class Drone(sprite.Sprite):
     groups = {"drones", "hurtable"}
+    always_active = True
 
     SPEED = 32
     FALL_SPEED = 48
@@ -509,6 +513,7 @@ class Drone(sprite.Sprite):
 
 class Rock(sprite.Sprite):
     groups = {"static-collision"}
+    always_active = True
 
     def __init__(
         self,
@@ -536,6 +541,7 @@ class Rock(sprite.Sprite):
 
 class Stump(sprite.Sprite):
     groups = {"static-collision"}
+    always_active = True
 
     def __init__(
         self,
@@ -1,11 +1,20 @@
 from enum import Enum, IntFlag, StrEnum, IntEnum, auto
-from typing import Callable, Any, Iterable, Iterator, Protocol, runtime_checkable
+from typing import (
+    Callable,
+    Any,
+    Collection,
+    Iterable,
+    Iterator,
+    Protocol,
+    runtime_checkable,
+)
 from pygame.typing import ColorLike, RectLike, Point, SequenceLike
 from pygame.math import Vector2
 from dataclasses import dataclass
 from copy import copy
 from numpy import ndarray
 from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import zengl
 import pygame
@@ -340,6 +349,10 @@ class PixelFont(Protocol):
 @runtime_checkable
 class Sprite(Protocol):
     groups: set[str]
+    static: bool
+    wake_margin: int
+    always_active: bool
+    dead: bool
 
     def attach(self, other: "Sprite") -> None:
         raise NotImplementedError
@@ -389,6 +402,12 @@ class Sprite(Protocol):
     def update(self, dt: float) -> bool:
         raise NotImplementedError
 
+    def snapshot_state(self) -> bytes:
+        raise NotImplementedError
+
+    def restore_state(self, state: bytes) -> None:
+        raise NotImplementedError
+
     def add_effect(self, effect: "SpriteEffect") -> None:
         raise NotImplementedError
 
@@ -615,6 +634,13 @@ class DTimer(_Timer, Protocol):
 
 @runtime_checkable
 class Loader(Protocol):
+    # None where there are no threads
+    worker: ThreadPoolExecutor | None
+    # images decoded ahead of time by preload_image, until load_image takes them
+    preloaded: dict[Path, pygame.Surface]
+    # changes whenever preloaded images are forgotten
+    preload_generation: int
+
     def postwindow_init(self) -> None:
         raise NotImplementedError
 
@@ -625,12 +651,18 @@ class Loader(Protocol):
     def join(self, path: FileID | Path) -> Path:
         raise NotImplementedError
 
+    def join_data(self, path: FileID, for_map: bool = False) -> Path:
+        raise NotImplementedError
+
     def get_text(self, path: FileID, for_map: bool = False) -> str:
         raise NotImplementedError
 
     def get_json(self, path: FileID, for_map: bool = False) -> Any:
         raise NotImplementedError
 
+    async def get_json_async(self, path: FileID, for_map: bool = False) -> Any:
+        raise NotImplementedError
+
     def save_json(self, path: FileID, data: dict[str, Any]) -> None:
         raise NotImplementedError
 
@@ -649,6 +681,15 @@ class Loader(Protocol):
     ) -> list[str]:
         raise NotImplementedError
 
+    async def get_csv_async(
+        self,
+        path: FileID,
+        item_delimiter: str = ",",
+        line_delimiter: str = "\n",
+        for_map: bool = False,
+    ) -> tuple[tuple[str, ...], ...]:
+        raise NotImplementedError
+
     @staticmethod
     def convert(surface: pygame.Surface) -> pygame.Surface:
         raise NotImplementedError
@@ -660,6 +701,26 @@ class Loader(Protocol):
     def get_surface(self, path: FileID, rect: RectLike | None = None) -> pygame.Surface:
         raise NotImplementedError
 
+    async def get_surface_async(
+        self, path: FileID, rect: RectLike | None = None
+    ) -> pygame.Surface:
+        raise NotImplementedError
+
+    def load_image(self, path: FileID) -> pygame.Surface:
+        raise NotImplementedError
+
+    def preload_image(self, path: FileID, generation: int) -> None:
+        raise NotImplementedError
+
+    def forget_preloaded(self) -> None:
+        raise NotImplementedError
+
+    def cache_report(self) -> dict[str, dict[str, int]]:
+        raise NotImplementedError
+
+    def run_in_background(self, job: Callable[[], Any]) -> Future[Any] | None:
+        raise NotImplementedError
+
     def get_spritesheet(
         self, path: FileID, size: Point = (16, 16)
     ) -> tuple[pygame.Surface, ...]:
@@ -752,6 +813,21 @@ class Game(Protocol):
     ) -> None:
         raise NotImplementedError
 
+    async def load_map_async(
+        self,
+        map_name: FileID,
+        direction: Direction | None = None,
+        position: Point | None = None,
+        entrance: MapEntranceType = MapEntranceType.NORMAL,
+    ) -> None:
+        raise NotImplementedError
+
+    # 0-1 progress of the map being loaded, 1 when nothing is loading
+    loading: float
+
+    def prefetch_map(self, map_name: FileID) -> None:
+        raise NotImplementedError
+
     def switch_level(
         self,
         level_name: FileID,
@@ -924,7 +1000,44 @@ class Level(GameState, Protocol):
     def get_group(self, group_name: str) -> set[Sprite]:
         raise NotImplementedError
 
-    def get_rects(self, rect_name: str) -> list[MiscRect]:
+    def get_rects(self, rect_name: str) -> Collection[MiscRect]:
+        raise NotImplementedError
+
+    def query_group(self, group_name: str, rect: MiscRect) -> list[Sprite]:
+        raise NotImplementedError
+
+    def query_rects(self, rect_name: str, rect: MiscRect) -> list[MiscRect]:
+        raise NotImplementedError
+
+    def query_colliders(self, rect_name: str, rect: MiscRect) -> list[MiscRect]:
+        raise NotImplementedError
+
+    def sweep_terrain(
+        self,
+        name: str,
+        rect: MiscRect,
+        delta: float,
+        axis: Axis,
+        one_way: bool = False,
+    ) -> float | None:
+        raise NotImplementedError
+
+    def collide_terrain(self, name: str, rect: MiscRect) -> bool:
+        raise NotImplementedError
+
+    def get_terrain_classes(self, rect: MiscRect) -> set[str]:
+        raise NotImplementedError
+
+    def snapshot(self) -> bytes:
+        raise NotImplementedError
+
+    def restore(self, data: bytes) -> None:
+        raise NotImplementedError
+
+    def save_checkpoint(self) -> None:
+        raise NotImplementedError
+
+    def retry(self) -> None:
         raise NotImplementedError
 
     def show(self, group: str = "player") -> None:
@@ -1,8 +1,12 @@
 import asyncio
+import functools
+import math
 import pathlib
-from collections import defaultdict
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
 from random import uniform
-from typing import Any, Callable, Iterator, cast
+from typing import Any, Callable, Collection, Generator, Iterable, Iterator, cast
 
 import pygame
 from pygame.typing import ColorLike, Point, RectLike
@@ -14,15 +18,21 @@ from gamelibs import (
     interfaces,
     particles,
     platformer,
+    render,
     hoverboarding,
-    sprite,
+    snapshot,
     topdown,
     util_draw,
     visual_fx,
     hardware,
+    spatial,
+    terrain,
+    tilemap,
 )
 
 CAMERA_SPEED = 128
+# bytes of map chunks, sprite images and terrain kept for levels the player has left
+LEVEL_CACHE_BUDGET = 48 * 1024 * 1024
 
 
 class Parallax(interfaces.Background):
@@ -63,66 +73,17 @@ class Parallax(interfaces.Background):
 
     @classmethod
     def load(cls, level: interfaces.Level, name: str) -> Iterator["Parallax"]:
-        # load background data
-        data = hardware.loader.get_json("backgrounds.json")
-        defaults = data.get("default", None)
-        background_data = data.get(name, None)
-        if (
-            background_data is None
-            or defaults is None
-            or background_data.get("source", None) is None
-        ):
-            print("WARNING: Unable to load background data")
-            return
-        background_data = {**defaults, **background_data}
-        # load background source
-        source_surface = hardware.loader.get_surface(background_data["source"])
-        # create layers
-        for layer in background_data["layers"]:
-            layer = {**defaults["layers"][0], **layer}
-            mode = layer["mode"]
-            anchor_bottom = False
-            # size setting - some backgrounds loop indefinitely.  Draw slightly larger than the screen.
-            if mode == "tile":
-                size = pygame.Vector2(layer["frames"][0][2:]) + util_draw.RESOLUTION
-                layer["loop_x"] = layer["loop_y"] = True
-                layer["anchor_bottom"] = False
-                frames = [
-                    util_draw.repeat_surface(source_surface.subsurface(i), size)
-                    for i in layer["frames"]
-                ]
-                item_size = tuple(layer["frames"][0][2:])
-            elif mode == "backdrop":
-                size = pygame.Vector2(256, 256)
-                if layer["loop_x"]:
-                    size[0] += util_draw.RESOLUTION[0]
-                if layer["loop_y"]:
-                    size[1] += util_draw.RESOLUTION[1]
-                elif layer["anchor_bottom"]:
-                    anchor_bottom = True
-                frames = [
-                    util_draw.repeat_surface(
-                        pygame.transform.scale(
-                            source_surface.subsurface(i), (256, 256)
-                        ),
-                        size,
-                    )
-                    for i in layer["frames"]
-                ]
-                item_size = (256, 256)
-            else:
-                print("WARNING: layer has incorrect mode set.  Skipping.")
-                continue
-            # create and return Parallax layer with loaded information
+        for layer in load_parallax_layers(name):
+            # the frames are shared, each level only gets its own animation state
             yield cls(
                 level=level,
-                anim=animation.Animation(frames, layer["anim_speed"]),
-                rect=pygame.FRect((0, 0), size),
-                item_size=item_size,
-                scroll_speed=(layer["scroll_x"], layer["scroll_y"]),
-                anchor_bottom=anchor_bottom,
-                loop_x=layer["loop_x"],
-                loop_y=layer["loop_y"],
+                anim=animation.Animation(list(layer.frames), layer.anim_speed),
+                rect=layer.frames[0].get_rect(),
+                item_size=layer.item_size,
+                scroll_speed=layer.scroll_speed,
+                anchor_bottom=layer.anchor_bottom,
+                loop_x=layer.loop_x,
+                loop_y=layer.loop_y,
             )
 
     def draw(self, surface: pygame.Surface, offset: Point) -> None:
@@ -130,11 +91,86 @@ class Parallax(interfaces.Background):
         if (not self.loop_y) and self.anchor_bottom:
             offset.y += self.level.map_rect.height - self.item_size.y
         offset = offset.elementwise() * self.scroll_speed
+        # frames are at least screen sized along looping axes,
+        # so wrapping takes at most two copies along each of them
+        width, height = self.image.get_size()
+        xs = [offset.x]
+        ys = [offset.y]
         if self.loop_x:
-            offset.x = offset.x % self.item_size.x - self.item_size.x
+            x = math.ceil(offset.x % width)
+            xs = [x - width, x]
         if self.loop_y:
-            offset.y = offset.y % self.item_size.y - self.item_size.y
-        surface.blit(self.image, self.rect.move(offset))
+            y = math.ceil(offset.y % height)
+            ys = [y - height, y]
+        surface.fblits([(self.image, (x, y)) for x in xs for y in ys])
+
+
+@dataclass(frozen=True)
+class ParallaxLayer:
+    frames: tuple[pygame.Surface, ...]
+    anim_speed: float
+    item_size: tuple[int, int]
+    scroll_speed: tuple[float, float]
+    anchor_bottom: bool
+    loop_x: bool
+    loop_y: bool
+
+
+@functools.cache
+def load_parallax_layers(name: str) -> tuple[ParallaxLayer, ...]:
+    # load background data
+    data = hardware.loader.get_json("backgrounds.json")
+    defaults = data.get("default", None)
+    background_data = data.get(name, None)
+    if (
+        background_data is None
+        or defaults is None
+        or background_data.get("source", None) is None
+    ):
+        print("WARNING: Unable to load background data")
+        return ()
+    background_data = {**defaults, **background_data}
+    # load background source
+    source_surface = hardware.loader.get_surface(background_data["source"])
+    # create layers
+    layers: list[ParallaxLayer] = []
+    for layer in background_data["layers"]:
+        layer = {**defaults["layers"][0], **layer}
+        mode = layer["mode"]
+        anchor_bottom = False
+        if mode == "tile":
+            layer["loop_x"] = layer["loop_y"] = True
+            frames = [source_surface.subsurface(i) for i in layer["frames"]]
+        elif mode == "backdrop":
+            if not layer["loop_y"]:
+                anchor_bottom = layer["anchor_bottom"]
+            frames = [
+                pygame.transform.scale(source_surface.subsurface(i), (256, 256))
+                for i in layer["frames"]
+            ]
+        else:
+            print("WARNING: layer has incorrect mode set.  Skipping.")
+            continue
+        # looping frames are repeated to a whole number of items covering the screen
+        item_size = frames[0].get_size()
+        size = list(item_size)
+        for axis, loop in enumerate((layer["loop_x"], layer["loop_y"])):
+            if loop:
+                size[axis] *= math.ceil(util_draw.RESOLUTION[axis] / item_size[axis])
+        if size != list(item_size):
+            frames = [util_draw.repeat_surface(frame, size) for frame in frames]
+        layers.append(
+            ParallaxLayer(
+                frames=tuple(frames),
+                anim_speed=layer["anim_speed"],
+                item_size=item_size,
+                scroll_speed=(layer["scroll_x"], layer["scroll_y"]),
+                anchor_bottom=anchor_bottom,
+                loop_x=layer["loop_x"],
+                loop_y=layer["loop_y"],
+            )
+        )
+    return tuple(layers)
 
 
 class Level(game_state.GameState, interfaces.Level):
@@ -147,6 +183,20 @@ class Level(game_state.GameState, interfaces.Level):
 
     TERRAIN_MOUNTAIN = 1
 
+    # sprites this far outside the screen are still drawn
+    DRAW_MARGIN = 16
+    # seconds of level building per frame when loading in the background
+    LOAD_SLICE = 0.004
+    # seconds of entity spawning per frame while a level fills in
+    SPAWN_SLICE = 0.002
+
+    NEIGHBOUR_DIRECTIONS = {
+        "n": interfaces.Direction.UP,
+        "s": interfaces.Direction.DOWN,
+        "e": interfaces.Direction.RIGHT,
+        "w": interfaces.Direction.LEFT,
+    }
+
     sprite_classes: dict[interfaces.MapType, dict[str, type | None]] = {
         interfaces.MapType.TOPDOWN: {
             "Emerald": platformer.immobile.Emerald,  # same for both perspectives
@@ -206,8 +256,19 @@ class Level(game_state.GameState, interfaces.Level):
         self._map_rect = pygame.Rect((0, 0), map_size)
         self._name = name
         self.backgrounds: list[interfaces.Background] = []
+        self.layer_stacks: list[tilemap.LayerStack] = []
         self.groups: dict[str, set[interfaces.Sprite]] = defaultdict(set)
-        self.rects: dict[str, list[interfaces.MiscRect]] = defaultdict(list)
+        # handles of the colliders each sprite added, so they leave when it dies
+        self.sprite_colliders: dict[interfaces.Sprite, list[tuple[str, int]]] = (
+            defaultdict(list)
+        )
+        self.rect_index: dict[str, spatial.SpatialHash] = defaultdict(
+            spatial.SpatialHash
+        )
+        # per frame broadphase for sprite groups, built the first time a group is queried
+        self.group_grids: dict[str, spatial.SpriteGrid] = {}
+        self.tile_grids: dict[str, terrain.TileGrid] = {}
+        self.terrain: dict[str, terrain.TerrainClass] = {}
         self.soundtrack = soundtrack
         rect = pygame.FRect(0, 0, 16, 16)
         small_rect = pygame.FRect(0, 0, 5, 5)
@@ -231,7 +292,23 @@ class Level(game_state.GameState, interfaces.Level):
         if player_facing and isinstance(self.player, topdown.mobile.Player):
             self.player.last_facing = player_facing
         self.sprites: set[interfaces.Sprite] = set()
+        self.draw_list = render.DrawList()
+        # per frame counters for profiling
+        self.stats: dict[str, int] = {}
+        self.blit_batch = render.BlitBatch()
         self.to_add: set[interfaces.Sprite] = set()
+        # how each live entity was spawned, so snapshots can spawn it again
+        self.spawn_fields: dict[
+            interfaces.Sprite, tuple[str, pygame.FRect, int, dict[str, Any]]
+        ] = {}
+        # entities spawned by another entity's constructor, which spawns them again
+        self.child_spawns: set[interfaces.Sprite] = set()
+        self.spawn_depth = 0
+        # entities waiting to be spawned, sorted so the nearest to the player is last
+        self.pending_spawns: list[tuple[str, pygame.FRect, int, dict[str, Any]]] = []
+        # snapshot taken on entry that dying can go back to
+        self.checkpoint: bytes | None = None
+        self.checkpoint_emeralds = 0
         self.gui: list[interfaces.GUISprite] = [
             gui2d.HeartMeter(self, (2, 2, 16 * 9, 9)),
             gui2d.EmeraldMeter(self, (2, 11, 0, 0)),
@@ -243,6 +320,8 @@ class Level(game_state.GameState, interfaces.Level):
         self.viewport_rect = pygame.FRect(util_draw.SCREEN_RECT)
         self.effects: list[interfaces.GlobalEffect] = []
         self.locked = False
+        # cached levels are pushed again, but keep what their cutscene did the first time
+        self.ran_map_cutscene = False
 
         self.shake_magnitude = 0
         self.shake_delta = 0
@@ -254,11 +333,51 @@ class Level(game_state.GameState, interfaces.Level):
         self.add_sprite(self.player)
         self.add_sprite(self.iball)
         self.update(0)
+        surface = hardware.loader.create_surface((16, 16))
+        surface.fill("blue")
+
+    def on_push(self) -> None:
+        super().on_push()
+        # levels can be built over several frames, so wait until this one is showing
         self.get_game().delayed_callback(
             0, lambda: self.get_game().run_cutscene("level_begin")
         )
-        surface = hardware.loader.create_surface((16, 16))
-        surface.fill("blue")
+        self.prefetch_neighbours()
+        # replaced once level_begin has run, in case dying comes first
+        self.save_checkpoint()
+
+    def save_checkpoint(self) -> None:
+        self.checkpoint = self.snapshot()
+        self.checkpoint_emeralds = hardware.save.get_state("emeralds")
+
+    def prefetch_neighbours(self) -> None:
+        # reads and decodes the maps next to this one so walking into them is quick
+        data = hardware.loader.get_json(
+            str(pathlib.Path("ldtk/simplified", self.name, "data")), for_map=True
+        )
+        hardware.loader.forget_preloaded()
+        generation = hardware.loader.preload_generation
+        for neighbour in data["neighbourLevels"]:
+            direction = self.NEIGHBOUR_DIRECTIONS.get(neighbour["dir"], None)
+            if direction is None:
+                continue
+            name = topdown.mobile.neighbour_name(self.name, direction)
+            hardware.loader.run_in_background(
+                lambda name=name: self.prefetch(name, generation)
+            )
+
+    @staticmethod
+    def prefetch(name: interfaces.FileID, generation: int) -> None:
+        # images are dropped if preloads were forgotten since generation was read
+        folder = pathlib.Path("ldtk/simplified", name)
+        if not hardware.loader.join_data(str(folder / "data.json"), True).exists():
+            return
+        data = hardware.loader.get_json(str(folder / "data"), for_map=True)
+        hardware.loader.get_csv(str(folder / "Ground"), for_map=True)
+        if data["customFields"]["Maptype"] == interfaces.MapType.TOPDOWN:
+            hardware.loader.get_csv(str(folder / "Elevation"), for_map=True)
+        for layer in data["layers"]:
+            hardware.loader.preload_image(folder / layer, generation)
 
     def attach(self, base: str, follower: str = "player") -> None:
         next(iter(self.get_group(follower))).attach(next(iter(self.get_group(base))))
@@ -308,6 +427,9 @@ class Level(game_state.GameState, interfaces.Level):
         self.shake_axes = axis
 
     async def attempt_map_cutscene(self) -> Any:
+        if self.ran_map_cutscene:
+            return False
+        self.ran_map_cutscene = True
         try:
             hardware.loader.get_cutscene(self.name)
         except FileNotFoundError:
@@ -357,27 +479,100 @@ class Level(game_state.GameState, interfaces.Level):
             z = self.entity_layer
         sprite_cls = self.sprite_classes[self.map_type].get(sprite_name, None)
         if sprite_cls is not None:
-            new_sprite = sprite_cls(self, rect, z, **custom_fields)
+            self.spawn_depth += 1
+            try:
+                new_sprite = sprite_cls(self, rect, z, **custom_fields)
+            finally:
+                self.spawn_depth -= 1
+            if self.spawn_depth:
+                self.child_spawns.add(new_sprite)
+            self.spawn_fields[new_sprite] = (
+                sprite_name,
+                pygame.FRect(rect),
+                z,
+                custom_fields,
+            )
             self.add_sprite(new_sprite)
             return new_sprite
 
     def add_sprite(self, sprite: interfaces.Sprite) -> None:
         self.to_add.add(sprite)
 
+    def queue_spawns(
+        self, spawns: Iterable[tuple[str, pygame.FRect, int, dict[str, Any]]]
+    ) -> None:
+        self.pending_spawns.extend(spawns)
+        player_pos = self.player.pos
+        self.pending_spawns.sort(
+            key=lambda spawn: player_pos.distance_squared_to(spawn[1].center),
+            reverse=True,
+        )
+
+    def spawn_pending(self) -> None:
+        # nearest entities first, until this frame's slice is used up
+        start = time.perf_counter()
+        pending = self.pending_spawns
+        while pending:
+            name, rect, z, fields = pending.pop()
+            self.spawn(name, rect, z, **fields)
+            if time.perf_counter() - start > self.SPAWN_SLICE:
+                break
+
+    def add_rect(
+        self,
+        group: str,
+        rect: interfaces.MiscRect,
+        dynamic: bool = False,
+        moving: bool = False,
+    ) -> int:
+        return self.rect_index[group].add(rect, dynamic, moving)
+
+    def remove_rect(self, group: str, handle: int) -> None:
+        self.rect_index[group].remove(handle)
+
+    def add_terrain(
+        self,
+        name: str,
+        grid: terrain.TileGrid,
+        values: Iterable[int],
+        vertical_merge: bool = True,
+    ) -> None:
+        terrain_class = terrain.TerrainClass(grid, values)
+        self.terrain[name] = terrain_class
+        for rect in terrain_class.rects(vertical_merge):
+            self.add_rect(name, rect)
+
     def add_sprite_internal(self, sprite: interfaces.Sprite) -> None:
         self.sprites.add(sprite)
+        self.draw_list.add(sprite)
         for group in sprite.groups:
             if group == "static-collision":
-                self.rects["collision"].append(sprite.collision_rect)  # type: ignore
-                if hasattr(sprite, "extra_collision_rects"):
-                    self.rects["collision"].extend(sprite.extra_collision_rects)  # type: ignore
+                self.add_sprite_rects("collision", sprite)
                 continue
             if group == "vertical-collision":
-                self.rects["platform"].append(sprite.collision_rect)  # type: ignore
-                if hasattr(sprite, "extra_collision_rects"):
-                    self.rects["platform"].extend(sprite.extra_collision_rects)  # type: ignore
+                self.add_sprite_rects("platform", sprite)
             self.groups[group].add(sprite)
 
+    def add_sprite_rects(self, group: str, sprite: interfaces.Sprite) -> None:
+        rects: list[interfaces.MiscRect] = [
+            sprite.collision_rect,  # type: ignore
+            *getattr(sprite, "extra_collision_rects", ()),
+        ]
+        for rect in rects:
+            handle = self.add_rect(group, rect, True, not sprite.static)
+            self.sprite_colliders[sprite].append((group, handle))
+
+    def remove_sprite_internal(self, sprite: interfaces.Sprite) -> None:
+        self.sprites.discard(sprite)
+        self.draw_list.remove(sprite)
+        for group in sprite.groups:
+            if group in self.groups:
+                self.groups[group].discard(sprite)
+        for group, handle in self.sprite_colliders.pop(sprite, ()):
+            self.remove_rect(group, handle)
+        self.spawn_fields.pop(sprite, None)
+        self.child_spawns.discard(sprite)
+
     def finish_dialog(self, answer: str | None) -> None:
         assert self.dialog is not None, "Dialog is not running"
         self.gui.remove(self.dialog)
@@ -485,11 +680,59 @@ class Level(game_state.GameState, interfaces.Level):
     def get_group(self, group_name: str) -> set[interfaces.Sprite]:
         return self.groups[group_name]
 
+    def query_group(
+        self, group_name: str, rect: interfaces.MiscRect
+    ) -> list[interfaces.Sprite]:
+        # sprites in a group whose collision rect overlaps rect
+        if group_name not in self.group_grids:
+            self.group_grids[group_name] = spatial.SpriteGrid(self.groups[group_name])
+        return self.group_grids[group_name].query(rect)
+
     def get_player(self) -> interfaces.Player:
         return self.player
 
-    def get_rects(self, rect_name: str) -> list[interfaces.MiscRect]:
-        return self.rects[rect_name]
+    def get_rects(self, rect_name: str) -> Collection[interfaces.MiscRect]:
+        # a live view of every rect in the group, query_rects is what collision should use
+        if rect_name not in self.rect_index:
+            return ()
+        return self.rect_index[rect_name].rects.values()
+
+    def query_rects(
+        self, rect_name: str, rect: interfaces.MiscRect
+    ) -> list[interfaces.MiscRect]:
+        if rect_name not in self.rect_index:
+            return []
+        return self.rect_index[rect_name].query(rect)
+
+    def query_colliders(
+        self, rect_name: str, rect: interfaces.MiscRect
+    ) -> list[interfaces.MiscRect]:
+        # only rects that belong to sprites, not map terrain
+        if rect_name not in self.rect_index:
+            return []
+        return self.rect_index[rect_name].query_dynamic(rect)
+
+    def sweep_terrain(
+        self,
+        name: str,
+        rect: interfaces.MiscRect,
+        delta: float,
+        axis: interfaces.Axis,
+        one_way: bool = False,
+    ) -> float | None:
+        if name not in self.terrain:
+            return None
+        return self.terrain[name].sweep(rect, delta, axis, one_way)
+
+    def collide_terrain(self, name: str, rect: interfaces.MiscRect) -> bool:
+        return name in self.terrain and self.terrain[name].collide(rect)
+
+    def get_terrain_classes(self, rect: interfaces.MiscRect) -> set[str]:
+        return {
+            name
+            for name, terrain_class in self.terrain.items()
+            if terrain_class.collide(rect)
+        }
 
     def show(self, group: str = "player") -> None:
         for sprite in self.get_group(group):
@@ -508,14 +751,64 @@ class Level(game_state.GameState, interfaces.Level):
         position: Point | None = None,
         entrance: interfaces.MapEntranceType = interfaces.MapEntranceType.NORMAL,
     ) -> "Level":
-        # basic metadata
-        folder = pathlib.Path("ldtk/simplified", name)
-        data = hardware.loader.get_json(str(folder / "data"), for_map=True)
+        builder = cls.build(game, name, direction, position, entrance)
+        while True:
+            try:
+                next(builder)
+            except StopIteration as done:
+                return done.value
+
+    @classmethod
+    async def load_async(
+        cls,
+        game: interfaces.Game,
+        name: interfaces.FileID,
+        direction: interfaces.Direction | None = None,
+        position: Point | None = None,
+        entrance: interfaces.MapEntranceType = interfaces.MapEntranceType.NORMAL,
+        on_progress: Callable[[float], Any] | None = None,
+    ) -> "Level":
+        # file reading and image decoding happen on the loader thread,
+        # then the level is built a slice at a time so frames keep coming
+        if hardware.loader.worker is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                hardware.loader.worker,
+                cls.prefetch,
+                name,
+                hardware.loader.preload_generation,
+            )
+            folder = pathlib.Path("ldtk/simplified", name)
+            data = await hardware.loader.get_json_async(
+                str(folder / "data"), for_map=True
+            )
+            backgrounds = await hardware.loader.get_json_async("backgrounds.json")
+            source = backgrounds.get(data["customFields"]["Background"], {}).get(
+                "source", None
+            )
+            if source is not None:
+                await hardware.loader.get_surface_async(source)
+        builder = cls.build(game, name, direction, position, entrance)
+        slice_start = time.perf_counter()
+        while True:
+            try:
+                progress = next(builder)
+            except StopIteration as done:
+                return done.value
+            if on_progress is not None:
+                on_progress(progress)
+            if time.perf_counter() - slice_start > cls.LOAD_SLICE:
+                await asyncio.sleep(0)
+                slice_start = time.perf_counter()
+
+    @staticmethod
+    def player_start(
+        data: dict[str, Any],
+        direction: interfaces.Direction | None = None,
+        position: Point | None = None,
+        entrance: interfaces.MapEntranceType = interfaces.MapEntranceType.NORMAL,
+    ) -> list[int]:
         size = data["width"], data["height"]
         map_type = data["customFields"]["Maptype"]
-        soundtrack = data["customFields"]["Soundtrack"]
-        map_rect = pygame.Rect((0, 0), size)
-        # level initialization
         player_position: list[int] = data["customFields"]["start"]
         position = (
             [int(position[0]), int(position[1])] if position else player_position.copy()
@@ -536,6 +829,143 @@ class Level(game_state.GameState, interfaces.Level):
                 player_position = [8, position[1]]
             if direction == "left":
                 player_position = [size[0] - 8, position[1]]
+        return player_position
+
+    def resume(
+        self,
+        direction: interfaces.Direction | None = None,
+        position: Point | None = None,
+    ) -> None:
+        # puts the player back at the right edge when a cached level is entered again
+        data = hardware.loader.get_json(
+            str(pathlib.Path("ldtk/simplified", self.name, "data")), for_map=True
+        )
+        self.player.rect.center = self.player_start(data, direction, position)
+        self.player.velocity *= 0
+        if direction and isinstance(self.player, topdown.mobile.Player):
+            self.player.last_facing = direction
+        self.reset_view()
+
+    def reset_view(self) -> None:
+        # camera, effects and locks go back to how a freshly loaded level has them
+        self.iball.move_to(self.player.head_rect.center)
+        self.viewport_rect.center = self.player.pos
+        self.viewport_rect.clamp_ip(self.map_rect)
+        self.clear_effects()
+        self.shake_magnitude = 0
+        self.dt_multiplier = 1
+        self.unlock()
+
+    def snapshot(self) -> bytes:
+        # entities, the player and their own state packed into bytes.
+        # Map assets are not included, restore() only works on a level with the same map.
+        start = time.perf_counter()
+        records: list[snapshot.Record] = [
+            (
+                None,
+                pygame.FRect(self.player.rect),
+                pygame.FRect(self.player.rect),
+                self.player.z,
+                {},
+                self.player.snapshot_state(),
+            )
+        ]
+        for sprite, (name, spawn_rect, z, fields) in self.spawn_fields.items():
+            if sprite in self.child_spawns:
+                continue
+            records.append(
+                (
+                    name,
+                    spawn_rect,
+                    pygame.FRect(sprite.rect),
+                    z,
+                    fields,
+                    sprite.snapshot_state(),
+                )
+            )
+        for name, spawn_rect, z, fields in self.pending_spawns:
+            records.append((name, spawn_rect, spawn_rect, z, fields, b""))
+        data = snapshot.dump(records)
+        self.stats["snapshot_us"] = int((time.perf_counter() - start) * 1_000_000)
+        self.stats["snapshot_bytes"] = len(data)
+        return data
+
+    def restore(self, data: bytes) -> None:
+        start = time.perf_counter()
+        # entities are dropped and spawned again, map chunks and the player are kept
+        kept = {self.player, self.iball}
+        for sprite in list(self.sprites):
+            if sprite not in kept and not isinstance(sprite, tilemap.TileChunk):
+                self.remove_sprite_internal(sprite)
+        self.to_add = {
+            sprite for sprite in self.to_add if isinstance(sprite, tilemap.TileChunk)
+        }
+        self.spawn_fields.clear()
+        self.child_spawns.clear()
+        self.pending_spawns.clear()
+        for name, spawn_rect, rect, z, fields, state in snapshot.load(data):
+            if name is None:
+                sprite = self.player
+            else:
+                sprite = self.spawn(name, spawn_rect, z, **fields)
+                if sprite is None:
+                    continue
+            sprite.rect.update(rect)
+            # entities that were still pending have no state of their own yet
+            if state:
+                sprite.restore_state(state)
+        self.player.velocity *= 0
+        self.player.effects.clear()
+        self.player.detach()
+        if self.player.hidden:
+            self.player.show()
+        self.reset_view()
+        self.stats["restore_us"] = int((time.perf_counter() - start) * 1_000_000)
+
+    def retry(self) -> None:
+        # back to the checkpoint with full health and the emeralds from then
+        hardware.save.set_state("emeralds", self.checkpoint_emeralds)
+        self.player.health = self.player.max_health
+        if self.map_type == interfaces.MapType.HOVERBOARD:
+            # a run's progress lives in its scrolling background, so it starts over
+            self.get_game().load_map(self.name)
+            return
+        assert self.checkpoint is not None, "Level has no checkpoint"
+        self.restore(self.checkpoint)
+
+    def memory_estimate(self) -> int:
+        # bytes that keeping this level around holds on to.
+        # Background and spritesheet frames are shared between levels, so not counted.
+        size = sum(stack.memory_estimate() for stack in self.layer_stacks)
+        size += sum(grid.tiles.nbytes for grid in self.tile_grids.values())
+        for sprite in self.sprites:
+            if not isinstance(sprite, tilemap.TileChunk):
+                image = sprite.to_draw
+                size += image.get_width() * image.get_height() * image.get_bytesize()
+        return size
+
+    @classmethod
+    def build(
+        cls,
+        game: interfaces.Game,
+        name: interfaces.FileID,
+        direction: interfaces.Direction | None = None,
+        position: Point | None = None,
+        entrance: interfaces.MapEntranceType = interfaces.MapEntranceType.NORMAL,
+    ) -> Generator[float, None, "Level"]:
+        # yields how far along it is between steps, returns the finished level
+        # basic metadata
+        folder = pathlib.Path("ldtk/simplified", name)
+        data = hardware.loader.get_json(str(folder / "data"), for_map=True)
+        size = data["width"], data["height"]
+        map_type = data["customFields"]["Maptype"]
+        soundtrack = data["customFields"]["Soundtrack"]
+        # level initialization
+        player_position = cls.player_start(data, direction, position, entrance)
+        entities = [
+            (key, entity) for key, value in data["entities"].items() for entity in value
+        ]
+        steps = 3
         level = cls(
             game,
             name=name,
@@ -560,60 +990,68 @@ class Level(game_state.GameState, interfaces.Level):
         # tile layers
         entity_layer = data["customFields"]["entity_layer"]
         level.entity_layer = entity_layer
+        # layers below the entities are flattened into one stack, the rest into another
+        below: dict[int, pathlib.Path] = {}
+        above: dict[int, pathlib.Path] = {}
         for layer_ind, layer in enumerate(data["layers"]):
-            level.add_sprite(
-                sprite.Sprite(
-                    level,
-                    hardware.loader.get_surface(folder / layer),
-                    pygame.FRect(map_rect),
-                    z=layer_ind * 3 + 1,
+            z = layer_ind * 3 + 1
+            (below if z < entity_layer else above)[z] = folder / layer
+        if below:
+            # nothing is drawn under these without a background, so skip the colorkey
+            fill = None if level.backgrounds else level.bgcolor
+            level.layer_stacks.append(
+                tilemap.LayerStack.load(
+                    level, map(str, below.values()), max(below), fill
                 )
             )
+        if above:
+            level.layer_stacks.append(
+                tilemap.LayerStack.load(level, map(str, above.values()), min(above))
+            )
+        yield 1 / steps
+        for stack in level.layer_stacks:
+            for chunk in stack.split():
+                level.add_sprite(chunk)
+        yield 2 / steps
         # sprites
-        for key, value in data["entities"].items():
-            sprite_cls = cls.sprite_classes[map_type][key]
-            if sprite_cls is None:
-                continue
-            for entity in value:
-                level.add_sprite(
-                    sprite_cls(
-                        level,
-                        (entity["x"], entity["y"], entity["width"], entity["height"]),
-                        z=entity_layer,
-                        **entity["customFields"],
-                    )
-                )
+        # spawned a few at a time once the level is running
+        level.queue_spawns(
+            (
+                sprite_name,
+                pygame.FRect(
+                    entity["x"], entity["y"], entity["width"], entity["height"]
+                ),
+                entity_layer,
+                entity["customFields"],
+            )
+            for sprite_name, entity in entities
+        )
         # collision data creation
         background_type = data["customFields"]["Background"] or "chasm"
-        for row, line in enumerate(
+        ground = terrain.TileGrid.from_csv(
             hardware.loader.get_csv(str(folder / "Ground"), for_map=True)
-        ):
-            for col, value in enumerate(line):
-                value = int(value)
-                rect = pygame.FRect(col * 16, row * 16, 16, 16)
-                if map_type == interfaces.MapType.PLATFORMER:
-                    if value == cls.TERRAIN_GROUND:
-                        level.rects["collision"].append(rect)
-                    if value == cls.TERRAIN_GROUND2:
-                        level.rects["platform"].append(rect)
-                elif map_type in {interfaces.MapType.TOPDOWN, interfaces.MapType.HOUSE}:
-                    if value == cls.TERRAIN_CLEAR:
-                        level.rects[background_type].append(rect)
-                    if value in {cls.TERRAIN_GROUND, cls.TERRAIN_GROUND2}:
-                        level.rects["ground"].append(rect)
+        )
+        level.tile_grids["Ground"] = ground
+        if map_type == interfaces.MapType.PLATFORMER:
+            level.add_terrain("collision", ground, {cls.TERRAIN_GROUND})
+            # platforms are one-way, so stacked ones must keep their own tops
+            level.add_terrain("platform", ground, {cls.TERRAIN_GROUND2}, False)
+        elif map_type in {interfaces.MapType.TOPDOWN, interfaces.MapType.HOUSE}:
+            level.add_terrain(background_type, ground, {cls.TERRAIN_CLEAR})
+            level.add_terrain(
+                "ground", ground, {cls.TERRAIN_GROUND, cls.TERRAIN_GROUND2}
+            )
         if map_type == interfaces.MapType.TOPDOWN:
-            for row, line in enumerate(
+            elevation = terrain.TileGrid.from_csv(
                 hardware.loader.get_csv(str(folder / "Elevation"), for_map=True)
-            ):
-                for col, value in enumerate(line):
-                    value = int(value)
-                    rect = pygame.FRect(col * 16, row * 16, 16, 16)
-                    if value == cls.TERRAIN_MOUNTAIN:
-                        level.rects["mountain"].append(rect)
+            )
+            level.tile_grids["Elevation"] = elevation
+            level.add_terrain("mountain", elevation, {cls.TERRAIN_MOUNTAIN})
 
         level.player.z = entity_layer
         level.iball.z = entity_layer + 1
         level.iball.move_to(level.player.head_rect.center)
+        yield 1
         return level
 
     def world_to_screen(self, pos: Point) -> pygame.Vector2:
@@ -626,14 +1064,42 @@ class Level(game_state.GameState, interfaces.Level):
         # adjusts dt if needed
         dt *= self.dt_multiplier
         self.dt_multiplier = 1
+        self.spawn_pending()
+        self.stats["pending"] = len(self.pending_spawns)
         # adds new sprites to the list
         for sprite in self.to_add:
             self.add_sprite_internal(sprite)
         self.to_add.clear()
+        self.group_grids.clear()
+        # sprites too far outside the screen sleep unless they ask to stay awake
+        wake_rects: dict[int, pygame.FRect] = {}
+        dead: list[interfaces.Sprite] = []
+        sleeping = 0
+        for sprite in self.sprites:
+            if not sprite.always_active:
+                # anything that can be drawn keeps updating, so nothing freezes on screen
+                margin = max(sprite.wake_margin, self.DRAW_MARGIN)
+                if margin not in wake_rects:
+                    wake_rects[margin] = self.viewport_rect.inflate(
+                        margin * 2, margin * 2
+                    )
+                if not wake_rects[margin].colliderect(sprite.rect):
+                    sleeping += 1
+                    # killed by something else while asleep
+                    if sprite.dead:
+                        dead.append(sprite)
+                    continue
+            if not sprite.update(dt):
+                dead.append(sprite)
+        self.stats["sleeping"] = sleeping
+        self.stats["active"] = len(self.sprites) - sleeping
         # removes dead sprites from the list
-        self.sprites = {sprite for sprite in self.sprites if sprite.update(dt)}
-        for group in self.groups.values():
-            group &= self.sprites
+        for sprite in dead:
+            self.remove_sprite_internal(sprite)
+        # refile colliders that moved this frame
+        for index in self.rect_index.values():
+            index.refresh()
+        self.draw_list.refresh()
         dest = self.player.pos
         self.viewport_rect.center = self.viewport_rect.center + pygame.Vector2(
             dest - self.viewport_rect.center
@@ -667,17 +1133,25 @@ class Level(game_state.GameState, interfaces.Level):
         for background in self.backgrounds:
             background.draw(self.game.window_surface, offset.copy())
         # draw map + sprites
-        for sprite in sorted(
-            self.sprites, key=lambda sprite: sprite.z * 1000 + sprite.rect.centery
-        ):
-            rect = sprite.rect.move(
-                (-int(self.viewport_rect.left), -int(self.viewport_rect.top))
-                + shake_offset
-            )
-            self.game.window_surface.blit(
-                sprite.to_draw,
-                rect,
-            )
+        screen_rect = self.game.window_surface.get_rect()
+        camera_offset = (
+            -int(self.viewport_rect.left),
+            -int(self.viewport_rect.top),
+        ) + shake_offset
+        visible_rect = screen_rect.move(-camera_offset).inflate(
+            self.DRAW_MARGIN * 2, self.DRAW_MARGIN * 2
+        )
+        offset_x, offset_y = camera_offset
+        for sprite in self.draw_list:
+            x, y = sprite.rect.topleft
+            if isinstance(sprite, tilemap.TileChunk):
+                # asking a chunk for its image composites it, so use its rect instead
+                size = sprite.rect.size
+            else:
+                size = sprite.to_draw.get_size()
+            if visible_rect.colliderect(x, y, *size):
+                self.blit_batch.add(sprite.to_draw, x + offset_x, y + offset_y)
+        self.blit_batch.flush(self.game.window_surface)
         # draw particles
         self.particle_manager.draw(
             self.game.window_surface,
@@ -689,3 +1163,43 @@ class Level(game_state.GameState, interfaces.Level):
         # draw gui
         for sprite in self.gui:
             sprite.draw(self.game.window_surface)
+
+
+class LevelCache:
+    # recently left levels, so walking back into them skips loading
+    def __init__(self, budget: int = LEVEL_CACHE_BUDGET) -> None:
+        self.budget = budget
+        self.levels: OrderedDict[interfaces.FileID, Level] = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def can_cache(level: Level) -> bool:
+        # hoverboard runs are timed set pieces and have to start over each time
+        return level.map_type != interfaces.MapType.HOVERBOARD
+
+    def put(self, level: Level) -> None:
+        if not self.can_cache(level):
+            return
+        self.levels[level.name] = level
+        self.levels.move_to_end(level.name)
+        self.evict()
+
+    def take(self, name: interfaces.FileID) -> Level | None:
+        level = self.levels.pop(name, None)
+        if level is None:
+            self.stats["misses"] += 1
+        else:
+            self.stats["hits"] += 1
+        return level
+
+    def memory_estimate(self) -> int:
+        return sum(level.memory_estimate() for level in self.levels.values())
+
+    def evict(self) -> None:
+        # least recently left levels go first
+        while self.levels and self.memory_estimate() > self.budget:
+            self.levels.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self.levels.clear()
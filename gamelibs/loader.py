@@ -1,15 +1,41 @@
-import functools
+import asyncio
 import gzip
+import io
 import json
 import pathlib
-from typing import Any
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
 import pygame
 from pygame.typing import Point, RectLike
 
-from gamelibs import pixelfont, env, interfaces
+from gamelibs import (
+    assetcache,
+    assetpack,
+    atlas,
+    pixelfont,
+    env,
+    interfaces,
+    surfacecache,
+)
 from gamelibs.interfaces import FileID
 from gamelibs.util_draw import COLORKEY
 
+T = TypeVar("T")
+
+# bytes each kind of asset may keep loaded, None for no limit
+CACHE_BUDGETS: dict[str, int | None] = {
+    "surface": 32 * 1024 * 1024,
+    # frames are views into the atlas, which keeps their pixels either way
+    "spritesheet": None,
+    "json": 8 * 1024 * 1024,
+    "csv": 8 * 1024 * 1024,
+    "text": 2 * 1024 * 1024,
+    "sound": 32 * 1024 * 1024,
+}
+# used everywhere, so never evicted
+PINNED_ASSETS = frozenset({"font.png", "me.png"})
+
 
 class Loader(interfaces.Loader):
     def __init__(self) -> None:
@@ -23,6 +49,34 @@ class Loader(interfaces.Loader):
         self.script_path = self.base_path / "scripts"
         self.cutscene_path = self.base_path / "cutscenes"
         self._font = None
+        self.caches = {
+            kind: assetcache.AssetCache(budget, PINNED_ASSETS)
+            for kind, budget in CACHE_BUDGETS.items()
+        }
+        # the browser build has no threads, so background work is skipped there
+        self.worker = None if env.PYGBAG else ThreadPoolExecutor(1, "loader")
+        # images decoded ahead of time, handed out once by load_image
+        self.preloaded: dict[pathlib.Path, pygame.Surface] = {}
+        # bumped by forget_preloaded, so prefetches started before it keep nothing
+        self.preload_generation = 0
+        self.preload_lock = threading.Lock()
+        # built with `python -m gamelibs.assetpack`, files fall back to disk without it
+        self.pack = (
+            None
+            if env.PYGBAG
+            else assetpack.AssetPack.open(
+                self.base_path / assetpack.PACK_NAME, check_stale=env.DEV
+            )
+        )
+        self.atlas = atlas.Atlas(self.create_surface)
+        # browser storage does not outlive the page, so there is nothing to cache to
+        self.surface_cache = (
+            None
+            if env.PYGBAG
+            else surfacecache.SurfaceCache(
+                self.base_path / surfacecache.CACHE_FILE, self.pack
+            )
+        )
 
     @property
     def font(self) -> interfaces.PixelFont:
@@ -63,14 +117,29 @@ class Loader(interfaces.Loader):
     def join_shader(self, path: FileID) -> pathlib.Path:
         return self.shader_path / path
 
-    @functools.cache
+    def read_bytes(self, path: pathlib.Path) -> bytes | memoryview:
+        if self.pack is not None:
+            data = self.pack.read(path)
+            if data is not None:
+                return data
+        return path.read_bytes()
+
+    def read_text(self, path: pathlib.Path) -> str:
+        # same newlines as a file opened in text mode
+        return str(self.read_bytes(path), "utf-8").replace("\r\n", "\n")
+
+    def read_image(self, path: pathlib.Path) -> pygame.Surface:
+        return pygame.image.load(io.BytesIO(self.read_bytes(path)), path.name)
+
+    @assetcache.cached("text")
     def get_text(self, path: FileID, for_map: bool = False) -> str:  # type: ignore
-        with self.join_data(path, for_map).open() as file:
-            return file.read()
+        return self.read_text(self.join_data(path, for_map))
 
-    @functools.cache
+    @assetcache.cached("json")
     def get_json(self, path: FileID, for_map: bool = False) -> Any:  # type: ignore
-        return json.load(self.join_data(path, for_map).with_suffix(".json").open())
+        return json.loads(
+            self.read_text(self.join_data(path, for_map).with_suffix(".json"))
+        )
 
     def save_json(self, path: FileID, data: Any) -> None:
         pathlib_path = self.join_data(path).with_suffix(".json")
@@ -91,7 +160,7 @@ class Loader(interfaces.Loader):
         env.update_settings(settings_dict)
         env.write_settings()
 
-    @functools.cache
+    @assetcache.cached("csv")
     def get_csv(self, path: FileID, item_delimiter: str = ",", line_delimiter: str = "\n", for_map: bool = False) -> tuple[tuple[str, ...], ...]:  # type: ignore
         text = self.get_text(path + ".csv", for_map)
         lines: list[tuple[str, ...]] = []
@@ -115,63 +184,138 @@ class Loader(interfaces.Loader):
         surface.fill(COLORKEY)
         return surface
 
-    @functools.cache
+    @assetcache.cached("surface")
     def get_surface(self, path: FileID, rect: RectLike | None = None) -> pygame.Surface:  # type: ignore
+        full_path = self.join_asset(path).with_suffix(".png")
+        if self.surface_cache is not None:
+            cached = self.surface_cache.load(full_path, rect)
+            if cached is not None:
+                return cached
+        return self.finish_surface(full_path, rect, self.read_image(full_path))
+
+    def finish_surface(
+        self, full_path: pathlib.Path, rect: RectLike | None, image: pygame.Surface
+    ) -> pygame.Surface:
+        # display conversion, which has to happen on the main thread
         if rect:
-            return self.convert(
-                pygame.image.load(self.join_asset(path).with_suffix(".png")).subsurface(
-                    rect
-                )
-            )
-        else:
-            return self.convert(
-                pygame.image.load(self.join_asset(path).with_suffix(".png"))
+            image = image.subsurface(rect)
+        surface = self.convert(image)
+        if self.surface_cache is not None:
+            self.surface_cache.store(full_path, rect, surface)
+        return surface
+
+    async def get_surface_async(
+        self, path: FileID, rect: RectLike | None = None
+    ) -> pygame.Surface:
+        # reading and decoding happen on the loader thread, the frame only pays for conversion
+        key = assetcache.cache_key(Loader.get_surface, (path, rect), {})
+        if self.worker is None or key in self.caches["surface"]:
+            return self.get_surface(path, rect)
+        full_path = self.join_asset(path).with_suffix(".png")
+        surface_cache = self.surface_cache
+        if surface_cache is not None and surface_cache.ready():
+            cached = surface_cache.decode(
+                await self.in_background(lambda: surface_cache.read(full_path, rect))
             )
+            if cached is not None:
+                return self.caches["surface"].get(key, path, lambda: cached)
+        image = await self.in_background(lambda: self.read_image(full_path))
+        return self.caches["surface"].get(
+            key, path, lambda: self.finish_surface(full_path, rect, image)
+        )
+
+    async def get_json_async(self, path: FileID, for_map: bool = False) -> Any:
+        return await self.in_background(lambda: self.get_json(path, for_map))
+
+    async def get_csv_async(
+        self,
+        path: FileID,
+        item_delimiter: str = ",",
+        line_delimiter: str = "\n",
+        for_map: bool = False,
+    ) -> tuple[tuple[str, ...], ...]:
+        return await self.in_background(
+            lambda: self.get_csv(path, item_delimiter, line_delimiter, for_map)
+        )
 
-    @functools.cache
+    def cache_report(self) -> dict[str, dict[str, int]]:
+        return {kind: cache.report() for kind, cache in self.caches.items()}
+
+    def run_in_background(self, job: Callable[[], Any]) -> Future[Any] | None:
+        if self.worker is None:
+            return None
+        return self.worker.submit(job)
+
+    async def in_background(self, job: Callable[[], T]) -> T:
+        # lets the game loop keep running while the job does, or just runs it without threads
+        future = self.run_in_background(job)
+        if future is None:
+            return job()
+        return await asyncio.wrap_future(future)
+
+    def preload_image(self, path: FileID, generation: int) -> None:
+        full_path = self.join_asset(path).with_suffix(".png")
+        if full_path in self.preloaded or generation != self.preload_generation:
+            return
+        image = self.read_image(full_path)
+        with self.preload_lock:
+            # forget_preloaded may have run while the image was being read
+            if generation == self.preload_generation:
+                self.preloaded[full_path] = image
+
+    def forget_preloaded(self) -> None:
+        with self.preload_lock:
+            self.preload_generation += 1
+            self.preloaded.clear()
+
+    # not cached or converted, for big images that get split up
+    def load_image(self, path: FileID) -> pygame.Surface:
+        full_path = self.join_asset(path).with_suffix(".png")
+        image = self.preloaded.pop(full_path, None)
+        if image is None:
+            image = self.read_image(full_path)
+        return image
+
+    @assetcache.cached("spritesheet")
     def get_spritesheet(self, path: FileID, size: Point = (16, 16)) -> tuple[pygame.Surface, ...]:  # type: ignore
+        # frames are atlas views that may share pixels, copy() one before drawing on it
         surface = self.get_surface(path)
         rect = pygame.Rect(0, 0, size[0], size[1])
         size_rect = surface.get_rect()
         images: list[pygame.Surface] = []
         while True:
-            images.append(surface.subsurface(rect).copy())
+            images.append(surface.subsurface(rect))
             rect.left += size[0]
             if not size_rect.contains(rect):
                 rect.left = 0
                 rect.top += size[1]
             if not size_rect.contains(rect):
                 break
-        return tuple(images)
+        return self.atlas.add_all(images)
 
-    @functools.cache
+    @assetcache.cached("sound")
     def get_sound(self, path: FileID) -> pygame.Sound:  # type: ignore
         return pygame.mixer.Sound(self.join_sound(path).with_suffix(".ogg"))
 
-    @functools.cache
+    @assetcache.cached("text")
     def get_script(self, path: FileID) -> str:  # type: ignore
-        with self.join_script(path).with_suffix(".snek").open() as file:
-            return file.read()
+        return self.read_text(self.join_script(path).with_suffix(".snek"))
 
-    @functools.cache
+    @assetcache.cached("text")
     def get_cutscene(self, path: FileID) -> str:  # type: ignore
-        with self.join_cutscene(path).with_suffix(".snek").open() as file:
-            return file.read()
+        return self.read_text(self.join_cutscene(path).with_suffix(".snek"))
 
-    @functools.cache
+    @assetcache.cached("text")
     def get_vertex_shader(self, path: FileID) -> str:  # type: ignore
-        with self.join_shader(path).with_suffix(".vert").open() as file:
-            return file.read()
+        return self.read_text(self.join_shader(path).with_suffix(".vert"))
 
-    @functools.cache
+    @assetcache.cached("text")
     def get_fragment_shader(self, path: str) -> str:  # type: ignore
-        with self.join_shader(path).with_suffix(".frag").open() as file:
-            return file.read()
+        return self.read_text(self.join_shader(path).with_suffix(".frag"))
 
-    @functools.cache
+    @assetcache.cached("text")
     def get_shader_library(self, path: FileID) -> str:  # type: ignore
-        with self.join_shader(path).with_suffix(".glsl").open() as file:
-            return file.read()
+        return self.read_text(self.join_shader(path).with_suffix(".glsl"))
 
     # not cached because save files change
     def get_save(self, path: FileID) -> dict[str, Any]:
@@ -223,3 +367,5 @@ class Loader(interfaces.Loader):
     def flush(self) -> None:
         env.write_saves()
         env.write_settings()
+        if self.surface_cache is not None:
+            self.surface_cache.close()
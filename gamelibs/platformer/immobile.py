@@ -73,6 +73,7 @@ class CrazyMushroom(sprite.Sprite, interfaces.PlatformerSprite, interfaces.Inter
 
 
 class Prop(sprite.Sprite, interfaces.PlatformerSprite):
+    static = True
     FIRST = 13
     LAST = 15
     SPEED = 0.6
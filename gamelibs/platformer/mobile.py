@@ -1,4 +1,5 @@
 from math import sin
+import struct
 from typing import Any
 
 import pygame
@@ -52,6 +53,45 @@ class PhysicsSprite(sprite.Sprite, interfaces.PlatformerSprite, interfaces.Colli
     def on_fallout(self) -> None:
         pass
 
+    def sweep(
+        self,
+        group: str,
+        old_rect: interfaces.MiscRect,
+        axis: interfaces.Axis,
+        one_way: bool = False,
+    ) -> tuple[float, interfaces.MiscRect | None] | None:
+        # nearest edge blocking the move from old_rect to the current collision rect.
+        # Terrain is swept tile by tile, sprite colliders are few enough to just check.
+        rect = self.collision_rect
+        if axis == interfaces.Axis.X:
+            delta = rect.x - old_rect.x
+        else:
+            delta = rect.y - old_rect.y
+        # a velocity too small to move the rect gives no side to sweep from,
+        # and guessing one could resolve against the face behind the sprite
+        if not delta:
+            return None
+        if axis == interfaces.Axis.X:
+            lead = old_rect.left if delta < 0 else old_rect.right
+        else:
+            lead = old_rect.top if delta < 0 else old_rect.bottom
+        level = self.get_level()
+        edge = level.sweep_terrain(group, old_rect, delta, axis, one_way)
+        hit = None
+        for collided in level.query_colliders(group, rect):
+            if axis == interfaces.Axis.X:
+                near = collided.right if delta < 0 else collided.left
+            else:
+                near = collided.bottom if delta < 0 else collided.top
+            if one_way and (near > lead if delta < 0 else near < lead):
+                continue
+            if edge is None or (near > edge if delta < 0 else near < edge):
+                edge = near
+                hit = collided
+        if edge is None:
+            return None
+        return edge, hit
+
     def update(self, dt: float, *, physics: bool = True) -> bool:
         # physics
         # moving platforms
@@ -80,68 +120,50 @@ class PhysicsSprite(sprite.Sprite, interfaces.PlatformerSprite, interfaces.Colli
                 self.on_fallout()
                 return False
             if vel.x < 0:
-                for collided in sorted(
-                    self.get_level().get_rects("collision"), key=lambda rect: -(rect.x)
-                ):
-                    if self.collision_rect.colliderect(collided):
-                        self.on_xy_collision(interfaces.Direction.LEFT)
-                        self.rect.x += collided.right - self.collision_rect.left
-                        self.velocity.x = 0
-                        break
+                hit = self.sweep("collision", old_rect, interfaces.Axis.X)
+                if hit:
+                    self.on_xy_collision(interfaces.Direction.LEFT)
+                    self.rect.x += hit[0] - self.collision_rect.left
+                    self.velocity.x = 0
             else:
-                for collided in sorted(
-                    self.get_level().get_rects("collision"), key=lambda rect: rect.x
-                ):
-                    if self.collision_rect.colliderect(collided):
-                        self.on_xy_collision(interfaces.Direction.RIGHT)
-                        self.rect.x += collided.left - self.collision_rect.right
-                        self.velocity.x = 0
-                        break
+                hit = self.sweep("collision", old_rect, interfaces.Axis.X)
+                if hit:
+                    self.on_xy_collision(interfaces.Direction.RIGHT)
+                    self.rect.x += hit[0] - self.collision_rect.right
+                    self.velocity.x = 0
+            old_rect = self.collision_rect
             self.rect.y += vel.y
             if vel.y < 0:
-                for collided in sorted(
-                    self.get_level().get_rects("collision"), key=lambda rect: -rect.y
-                ):
-                    if self.collision_rect.colliderect(collided):
-                        self.on_xy_collision(interfaces.Direction.UP)
-                        self.rect.y += collided.bottom - self.collision_rect.top
-                        self.velocity.y = 0
-                        break
+                hit = self.sweep("collision", old_rect, interfaces.Axis.Y)
+                if hit:
+                    self.on_xy_collision(interfaces.Direction.UP)
+                    self.rect.y += hit[0] - self.collision_rect.top
+                    self.velocity.y = 0
             else:
                 if not self.ducking:
-                    for collided in sorted(
-                        self.get_level().get_rects("platform"), key=lambda rect: rect.y
-                    ):
-                        if (
-                            old_rect.bottom <= collided.top
-                            and self.collision_rect.colliderect(collided)
-                        ):
-                            self.on_xy_collision(interfaces.Direction.DOWN)
-                            self.rect.y += collided.top - self.collision_rect.bottom
-                            self.velocity.y = 0
-                            self.on_ground = True
-                            self.on_downer = True
-                            self.ground_rect = collided
-                            self.ground_rect_relative = (
-                                self.pos - self.ground_rect.center
-                            )
-                            break
-                for collided in sorted(
-                    self.get_level().get_rects("collision"), key=lambda rect: rect.y
-                ):
-                    if self.collision_rect.colliderect(collided):
+                    hit = self.sweep("platform", old_rect, interfaces.Axis.Y, True)
+                    if hit:
                         self.on_xy_collision(interfaces.Direction.DOWN)
-                        self.rect.y += collided.top - self.collision_rect.bottom
+                        self.rect.y += hit[0] - self.collision_rect.bottom
                         self.velocity.y = 0
                         self.on_ground = True
-                        self.ground_rect = collided
-                        self.ground_rect_relative = self.pos - self.ground_rect.center
-                        break
+                        self.on_downer = True
+                        self.ground_rect = hit[1]
+                hit = self.sweep("collision", old_rect, interfaces.Axis.Y)
+                if hit:
+                    self.on_xy_collision(interfaces.Direction.DOWN)
+                    self.rect.y += hit[0] - self.collision_rect.bottom
+                    self.velocity.y = 0
+                    self.on_ground = True
+                    self.ground_rect = hit[1]
+                if self.ground_rect:
+                    self.ground_rect_relative = self.pos - self.ground_rect.center
             self.ducking = False
         return super().update(dt)
 
 
 class Ship(sprite.Sprite):
+    always_active = True
     SHIPS = {
         "ford": (0, 80, 48, 32),
     }
@@ -162,6 +184,12 @@ class Ship(sprite.Sprite):
         self.duration: float = custom_fields.get("duration", 4)  # type: ignore
         self.age = 0.0
 
+    def snapshot_state(self) -> bytes:
+        return struct.pack("<f", self.age)
+
+    def restore_state(self, state: bytes) -> None:
+        (self.age,) = struct.unpack("<f", state)
+
     def update(self, dt: float) -> bool:
         self.age += dt
         if self.age <= self.duration:
@@ -1,3 +1,4 @@
+import struct
 from typing import Any
 import pygame
 from pygame.typing import RectLike
@@ -16,6 +17,7 @@ WALLJUMP_Y_SPEED = 400
 
 class Player(mobile.PhysicsSprite, interfaces.PlatformerPlayer):
     groups = {"player", *mobile.PhysicsSprite.groups}
+    always_active = True
 
     def __init__(
         self,
@@ -159,10 +161,11 @@ class Player(mobile.PhysicsSprite, interfaces.PlatformerPlayer):
                 else:
                     interaction_rect = self.rect.move(8, 0)
                 # TODO: new getter for every sprite type?
-                for sprite in self.get_level().get_group("interactable"):
-                    if interaction_rect.colliderect(sprite.collision_rect):  # type: ignore
-                        sprite.interact()  # type: ignore
-                        break
+                for sprite in self.get_level().query_group(
+                    "interactable", interaction_rect
+                ):
+                    sprite.interact()  # type: ignore
+                    break
         if self.state == "pound":
             hit = self.on_ground
             if not hit and not self.ducking:
@@ -238,6 +241,12 @@ class Player(mobile.PhysicsSprite, interfaces.PlatformerPlayer):
     def pay(self, emeralds: int) -> None:
         self.emeralds = min(999, self.emeralds + emeralds)
 
+    def snapshot_state(self) -> bytes:
+        return struct.pack("<?", self.facing_left)
+
+    def restore_state(self, state: bytes) -> None:
+        (self.facing_left,) = struct.unpack("<?", state)
+
     def charge(self, emeralds: int) -> None:
         self.emeralds = max(0, self.emeralds - emeralds)
 
@@ -300,6 +309,8 @@ class Player(mobile.PhysicsSprite, interfaces.PlatformerPlayer):
 
 
 class DeadPlayer(sprite.Sprite):
+    always_active = True
+
     def __init__(
         self, level: interfaces.Level, rect: RectLike, z: int = 0, **_: Any
     ) -> None:
@@ -1,11 +1,12 @@
 import math
+import struct
 from typing import Any
 from enum import Enum, auto
 
 import pygame
 from pygame.typing import RectLike
 
-from gamelibs import easings, sprite, timer, projectile, interfaces, hardware
+from gamelibs import easings, sprite, timer, projectile, interfaces, hardware, util_draw
 from gamelibs.animation import NoLoopAnimation, SingleAnimation
 
 
@@ -51,11 +52,19 @@ class Battery(sprite.Sprite, interfaces.PuzzleTrigger):
     def reverse_time(self) -> None:
         self.state = self.STATE_FIXED
 
+    def snapshot_state(self) -> bytes:
+        return struct.pack("<B", self.state)
+
+    def restore_state(self, state: bytes) -> None:
+        (self.state,) = struct.unpack("<B", state)
+
 
 class GunPlatform(sprite.Sprite):
     groups = {
         "vertical-collision",
     }
+    # fires along its whole row, so it has to keep moving well off screen
+    wake_margin = util_draw.RESOLUTION[0]
 
     class State(Enum):
         OFF = auto()
@@ -100,6 +109,13 @@ class GunPlatform(sprite.Sprite):
             self.shoot_direction = interfaces.Direction.RIGHT
             self.shoot_start = pygame.Vector2(self.rect.width + 2, 4)
 
+    def snapshot_state(self) -> bytes:
+        return struct.pack("<Bff", self.state.value, self.angle, self.dest_dt)
+
+    def restore_state(self, state: bytes) -> None:
+        value, self.angle, self.dest_dt = struct.unpack("<Bff", state)
+        self.state = self.State(value)
+
     def shoot(self) -> None:
         if self.state == self.State.ARRIVED:
             self.state = self.State.SHOOTING
@@ -8,6 +8,7 @@ from gamelibs import sprite, timer, interfaces, hardware
 class Laser(sprite.Sprite):
     groups = {"projectiles"}
     SPEED = 100
+    always_active = True
 
     def __init__(
         self,
@@ -36,7 +37,10 @@ class Laser(sprite.Sprite):
                 return False
             if (
                 self.get_level().map_type != interfaces.MapType.HOVERBOARD
-                and self.rect.collidelist(self.get_level().get_rects("collision")) != -1
+                and self.rect.collidelist(
+                    self.get_level().query_rects("collision", self.rect)
+                )
+                != -1
             ):
                 return False
         return not self.death_timer.done() and super().update(dt)
@@ -45,6 +49,7 @@ class Laser(sprite.Sprite):
 class MiniLaser(sprite.Sprite):
     groups = {"projectiles"}
     SPEED = 250
+    always_active = True
 
     def __init__(
         self,
@@ -68,13 +73,15 @@ class MiniLaser(sprite.Sprite):
     def update(self, dt: float) -> bool:
         if not self.locked:
             self.rect.center += self.velocity * dt * self.SPEED
-            for sprite in self.get_level().get_group("hurtable"):
-                if sprite.collision_rect.colliderect(self.rect):  # type: ignore
-                    sprite.hurt(1)  # type: ignore
-                    return False
+            for sprite in self.get_level().query_group("hurtable", self.rect):
+                sprite.hurt(1)  # type: ignore
+                return False
             if (
                 self.get_level().map_type != interfaces.MapType.HOVERBOARD
-                and self.rect.collidelist(self.get_level().get_rects("collision")) != -1
+                and self.rect.collidelist(
+                    self.get_level().query_rects("collision", self.rect)
+                )
+                != -1
             ):
                 return False
         return not self.death_timer.done() and super().update(dt)
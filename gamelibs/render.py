@@ -0,0 +1,75 @@
+from bisect import bisect_left, bisect_right
+from typing import Iterator
+
+import pygame
+
+from gamelibs import interfaces
+
+
+def draw_key(sprite: interfaces.Sprite) -> float:
+    return sprite.z * 1000 + sprite.rect.centery
+
+
+class DrawList:
+    # sprites kept in draw order between frames.
+    # Static sprites never move or change z, so they are only sorted in once.
+    # Everything else is moved only when its key changes.
+    def __init__(self) -> None:
+        self.keys: list[float] = []
+        self.sprites: list[interfaces.Sprite] = []
+        self.placed: dict[interfaces.Sprite, float] = {}
+        self.moving: set[interfaces.Sprite] = set()
+
+    def __iter__(self) -> Iterator[interfaces.Sprite]:
+        return iter(self.sprites)
+
+    def __len__(self) -> int:
+        return len(self.sprites)
+
+    def add(self, sprite: interfaces.Sprite) -> None:
+        key = draw_key(sprite)
+        index = bisect_right(self.keys, key)
+        self.keys.insert(index, key)
+        self.sprites.insert(index, sprite)
+        self.placed[sprite] = key
+        if not sprite.static:
+            self.moving.add(sprite)
+
+    def remove(self, sprite: interfaces.Sprite) -> None:
+        key = self.placed.pop(sprite)
+        index = bisect_left(self.keys, key)
+        while self.sprites[index] is not sprite:
+            index += 1
+        del self.keys[index]
+        del self.sprites[index]
+        self.moving.discard(sprite)
+
+    def refresh(self) -> None:
+        placed = self.placed
+        for sprite in [
+            sprite for sprite in self.moving if draw_key(sprite) != placed[sprite]
+        ]:
+            self.remove(sprite)
+            self.add(sprite)
+
+
+class BlitBatch:
+    # (surface, dest) pairs submitted with one fblits call.
+    # The dest rects are kept between frames instead of being rebuilt for every sprite.
+    def __init__(self) -> None:
+        self.dests: list[pygame.Rect] = []
+        self.items: list[tuple[pygame.Surface, pygame.Rect]] = []
+
+    def add(self, surface: pygame.Surface, x: float, y: float) -> None:
+        index = len(self.items)
+        if index == len(self.dests):
+            self.dests.append(pygame.Rect())
+        dest = self.dests[index]
+        dest.x = x  # type: ignore
+        dest.y = y  # type: ignore
+        self.items.append((surface, dest))
+
+    def flush(self, target: pygame.Surface) -> None:
+        # surfaces past the edge are clipped by SDL, so only the visible part is read
+        target.fblits(self.items)
+        self.items.clear()
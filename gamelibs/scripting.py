@@ -104,6 +104,16 @@ class Fade(AsyncSNEKCallable):
         return await self.game.get_state().fade(*args)
 
 
+class MapSwitch(AsyncSNEKCallable):
+    def __init__(self, game):
+        self.game = game
+        # name, direction, position, entrance
+        self._arity = Arity(1, 4)
+
+    async def call(self, interpreter, args):
+        return await self.game.load_map_async(*args)
+
+
 class Script(SNEKProgram):
     def __init__(self, game, script, api=None):
         if api is None:
@@ -138,7 +148,9 @@ class Script(SNEKProgram):
                 lambda *args: game.get_state().fill(*args), Arity(0, 4)
             ),
             "clear": SNEKCallable(lambda *args: game.get_state().clear(*args), 0),
-            "map_switch": SNEKCallable(lambda *args: game.load_map(*args), Arity(1, 4)),
+            "map_switch": MapSwitch(game),
+            "prefetch_map": SNEKCallable(game.prefetch_map, 1),
+            "loading": SNEKCallable(lambda: game.loading, 0),
             "exit_level": SNEKCallable(lambda: game.pop_state(), 0),
             "pop_state": SNEKCallable(lambda: game.pop_state(), 0),
             "get_save_state": SNEKCallable(hardware.save.get_state, 1),
@@ -159,6 +171,8 @@ class Script(SNEKProgram):
             ),
             "save": SNEKCallable(hardware.save.save, 0),
             "quit": SNEKCallable(game.quit, 0),
+            "retry": SNEKCallable(lambda: game.get_state().retry(), 0),
+            "checkpoint": SNEKCallable(lambda: game.get_state().save_checkpoint(), 0),
             **api,
         }
         super().__init__(script=script, api=api)
@@ -0,0 +1,62 @@
+import json
+import struct
+from typing import Any, Iterable, Iterator
+
+import pygame
+
+# binary layout of a level snapshot, all little endian:
+#   header: magic, version, length of the class name table, record count
+#   class name table: json list of the sprite names used by the records
+#   records: fixed size part, then the spawn fields as json, then the sprite's own state
+MAGIC = b"LVSN"
+VERSION = 1
+HEADER = struct.Struct("<4sHIH")
+# class index, spawn rect, current rect, z, spawn fields size, state size
+RECORD = struct.Struct("<H4f4fhIH")
+# class index of the player record, which is not spawned from the class table
+PLAYER = 0xFFFF
+
+Record = tuple[str | None, pygame.FRect, pygame.FRect, int, dict[str, Any], bytes]
+
+
+def dump(records: Iterable[Record]) -> bytes:
+    names: dict[str, int] = {}
+    body: list[bytes] = []
+    for name, spawn_rect, rect, z, fields, state in records:
+        if name is None:
+            index = PLAYER
+        else:
+            index = names.setdefault(name, len(names))
+        encoded_fields = json.dumps(fields, separators=(",", ":")).encode()
+        body.append(
+            RECORD.pack(index, *spawn_rect, *rect, z, len(encoded_fields), len(state))
+        )
+        body.append(encoded_fields)
+        body.append(state)
+    table = json.dumps(list(names)).encode()
+    header = HEADER.pack(MAGIC, VERSION, len(table), len(body) // 3)
+    return b"".join((header, table, *body))
+
+
+def load(data: bytes) -> Iterator[Record]:
+    magic, version, table_size, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a version {VERSION} level snapshot")
+    offset = HEADER.size
+    names: list[str] = json.loads(data[offset : offset + table_size])
+    offset += table_size
+    for _ in range(count):
+        index, *values, fields_size, state_size = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        fields = json.loads(data[offset : offset + fields_size])
+        offset += fields_size
+        state = data[offset : offset + state_size]
+        offset += state_size
+        yield (
+            None if index == PLAYER else names[index],
+            pygame.FRect(values[0:4]),
+            pygame.FRect(values[4:8]),
+            values[8],
+            fields,
+            state,
+        )
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Collection
 import numpy
 import pygame
 from pygame.typing import Point, RectLike
@@ -112,9 +112,52 @@ class Space(game_state.GameState, interfaces.SpaceLevel):
     def get_group(self, group_name: str = "player") -> set[interfaces.Sprite]:
         raise KeyError("Group does not exist in Space")
 
-    def get_rects(self, rect_name: str) -> list[interfaces.MiscRect]:
+    def get_rects(self, rect_name: str) -> Collection[interfaces.MiscRect]:
         raise KeyError("Group does not exist in Space")
 
+    def query_group(
+        self, group_name: str, rect: interfaces.MiscRect
+    ) -> list[interfaces.Sprite]:
+        raise KeyError("Group does not exist in Space")
+
+    def query_rects(
+        self, rect_name: str, rect: interfaces.MiscRect
+    ) -> list[interfaces.MiscRect]:
+        raise KeyError("Group does not exist in Space")
+
+    def query_colliders(
+        self, rect_name: str, rect: interfaces.MiscRect
+    ) -> list[interfaces.MiscRect]:
+        raise KeyError("Group does not exist in Space")
+
+    def sweep_terrain(
+        self,
+        name: str,
+        rect: interfaces.MiscRect,
+        delta: float,
+        axis: interfaces.Axis,
+        one_way: bool = False,
+    ) -> float | None:
+        raise KeyError("Terrain does not exist in Space")
+
+    def collide_terrain(self, name: str, rect: interfaces.MiscRect) -> bool:
+        raise KeyError("Terrain does not exist in Space")
+
+    def get_terrain_classes(self, rect: interfaces.MiscRect) -> set[str]:
+        raise KeyError("Terrain does not exist in Space")
+
+    def snapshot(self) -> bytes:
+        raise NotImplementedError
+
+    def restore(self, data: bytes) -> None:
+        raise NotImplementedError
+
+    def save_checkpoint(self) -> None:
+        raise KeyError("Checkpoints do not exist in Space")
+
+    def retry(self) -> None:
+        raise KeyError("Checkpoints do not exist in Space")
+
     def show(self, group: str = "player") -> None:
         raise KeyError("Group does not exist in Space")
 
@@ -0,0 +1,179 @@
+import math
+from collections import defaultdict
+from typing import Callable, Iterable, Iterator
+
+import pygame
+
+from gamelibs import interfaces
+
+CELL_SIZE = 64
+DEPENETRATION_BUDGET = 8
+# how far a sprite or collider can move after it is filed and still be found
+SPRITE_GRID_MARGIN = 32
+
+
+def cell_range(
+    rect: interfaces.MiscRect, size: int = CELL_SIZE
+) -> Iterator[tuple[int, int]]:
+    left = math.floor(rect.left / size)
+    top = math.floor(rect.top / size)
+    right = max(left, math.ceil(rect.right / size) - 1)
+    bottom = max(top, math.ceil(rect.bottom / size) - 1)
+    for y in range(top, bottom + 1):
+        for x in range(left, right + 1):
+            yield x, y
+
+
+class SpatialHash:
+    # collider registry: every rect gets a handle that is used to take it out again.
+    # Moving rects are filed under a copy of themselves grown by twice the margin,
+    # and refresh() refiles them once they get within margin of its edge,
+    # so they can always move up to margin between refreshes.
+    def __init__(
+        self, cell_size: int = CELL_SIZE, margin: int = SPRITE_GRID_MARGIN
+    ) -> None:
+        self.cell_size = cell_size
+        self.margin = margin
+        self.cells: dict[tuple[int, int], dict[int, interfaces.MiscRect]] = defaultdict(
+            dict
+        )
+        self.rects: dict[int, interfaces.MiscRect] = {}
+        self.filed: dict[int, pygame.FRect] = {}
+        # rects owned by sprites rather than the map
+        self.dynamic: set[int] = set()
+        self.moving: set[int] = set()
+        self.next_handle = 0
+
+    def cell_range(self, rect: interfaces.MiscRect) -> Iterator[tuple[int, int]]:
+        return cell_range(rect, self.cell_size)
+
+    def file(self, handle: int, area: interfaces.MiscRect) -> None:
+        self.filed[handle] = pygame.FRect(area)
+        rect = self.rects[handle]
+        for cell in self.cell_range(area):
+            self.cells[cell][handle] = rect
+
+    def unfile(self, handle: int) -> None:
+        for cell in self.cell_range(self.filed.pop(handle)):
+            del self.cells[cell][handle]
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def add(
+        self, rect: interfaces.MiscRect, dynamic: bool = False, moving: bool = False
+    ) -> int:
+        handle = self.next_handle
+        self.next_handle += 1
+        self.rects[handle] = rect
+        if dynamic:
+            self.dynamic.add(handle)
+        if moving:
+            self.moving.add(handle)
+            self.file(handle, rect.inflate(self.margin * 4, self.margin * 4))
+        else:
+            self.file(handle, rect)
+        return handle
+
+    def remove(self, handle: int) -> None:
+        self.unfile(handle)
+        del self.rects[handle]
+        self.dynamic.discard(handle)
+        self.moving.discard(handle)
+
+    def refresh(self) -> None:
+        margin = self.margin
+        for handle in self.moving:
+            rect = self.rects[handle]
+            if not self.filed[handle].inflate(-margin * 2, -margin * 2).contains(rect):
+                self.unfile(handle)
+                self.file(handle, rect.inflate(margin * 4, margin * 4))
+
+    def query(self, rect: interfaces.MiscRect) -> list[interfaces.MiscRect]:
+        found: dict[int, interfaces.MiscRect] = {}
+        cells = self.cells
+        for cell in self.cell_range(rect):
+            if cell in cells:
+                found.update(cells[cell])
+        return list(found.values())
+
+    def query_dynamic(self, rect: interfaces.MiscRect) -> list[interfaces.MiscRect]:
+        found: dict[int, interfaces.MiscRect] = {}
+        cells = self.cells
+        dynamic = self.dynamic
+        for cell in self.cell_range(rect):
+            if cell in cells:
+                for handle, item in cells[cell].items():
+                    if handle in dynamic and item.colliderect(rect):
+                        found[handle] = item
+        return list(found.values())
+
+
+class SpriteGrid:
+    # broadphase for one sprite group, rebuilt once per frame.
+    # Sprites are filed under their collision rect grown by a margin,
+    # so they can keep moving for the rest of the frame and still be found.
+    def __init__(
+        self,
+        sprites: Iterable[interfaces.Sprite],
+        cell_size: int = CELL_SIZE,
+        margin: int = SPRITE_GRID_MARGIN,
+    ) -> None:
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[interfaces.Sprite]] = defaultdict(list)
+        for sprite in sprites:
+            rect = collision_rect(sprite).inflate(margin * 2, margin * 2)
+            for cell in cell_range(rect, cell_size):
+                self.cells[cell].append(sprite)
+
+    def query(self, rect: interfaces.MiscRect) -> list[interfaces.Sprite]:
+        found: dict[int, interfaces.Sprite] = {}
+        cells = self.cells
+        for cell in cell_range(rect, self.cell_size):
+            if cell in cells:
+                for sprite in cells[cell]:
+                    if id(sprite) not in found and collision_rect(sprite).colliderect(
+                        rect
+                    ):
+                        found[id(sprite)] = sprite
+        return list(found.values())
+
+
+def collision_rect(sprite: interfaces.Sprite) -> interfaces.MiscRect:
+    return getattr(sprite, "collision_rect", sprite.rect)
+
+
+def depenetrate(
+    rect: interfaces.MiscRect,
+    query: Callable[[interfaces.MiscRect], list[interfaces.MiscRect]],
+    bounds: interfaces.MiscRect,
+    budget: int = DEPENETRATION_BUDGET,
+) -> pygame.Vector2 | None:
+    # smallest offset that moves rect out of every rect query finds, staying in bounds.
+    # Each direction is tried by hopping straight to the far edge of whatever is hit,
+    # so a deep overlap costs a few steps instead of a pixel by pixel search.
+    # Every hop asks query again, since it can land next to colliders not yet seen.
+    # Gives up on a direction after budget hops or once it leaves bounds.
+    best: pygame.Vector2 | None = None
+    bounds = pygame.FRect(bounds)
+    for direction in interfaces.Direction:
+        moved = pygame.FRect(rect)
+        for _ in range(budget):
+            if not bounds.contains(moved):
+                break
+            rects = query(moved)
+            index = moved.collidelist(rects)  # type: ignore
+            if index == -1:
+                offset = pygame.Vector2(moved.topleft) - rect.topleft
+                if best is None or offset.length_squared() < best.length_squared():
+                    best = offset
+                break
+            other = rects[index]
+            if direction == interfaces.Direction.LEFT:
+                moved.right = other.left
+            elif direction == interfaces.Direction.RIGHT:
+                moved.left = other.right
+            elif direction == interfaces.Direction.UP:
+                moved.bottom = other.top
+            else:
+                moved.top = other.bottom
+    return best
@@ -6,6 +6,12 @@ from gamelibs import interfaces
 
 class Sprite(interfaces.Sprite):
     groups: set[str] = set()
+    # static sprites never move or change z after they are added to a level
+    static = False
+    # sprites further than this outside the screen are not updated,
+    # never less than the level's draw margin
+    wake_margin = 64
+    always_active = False
 
     def __init__(
         self,
@@ -18,6 +24,8 @@ class Sprite(interfaces.Sprite):
             image = pygame.Surface((0, 0))
         self._level: interfaces.Level = level
         self.image: pygame.Surface = image
+        # replaced by update(), sprites that start out asleep show their image as is
+        self._to_draw = image
         self._rect: interfaces.MiscRect = pygame.FRect(rect)
         self._z = z
         self.velocity = pygame.Vector2()
@@ -106,6 +114,13 @@ class Sprite(interfaces.Sprite):
             self.to_draw = pygame.Surface((0, 0))
         return not self.dead
 
+    def snapshot_state(self) -> bytes:
+        # anything a sprite changes about itself after spawning, for level snapshots
+        return b""
+
+    def restore_state(self, state: bytes) -> None:
+        pass
+
 
 class GUISprite(Sprite):
     def draw(self, surface: pygame.Surface) -> None:
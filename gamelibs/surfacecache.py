@@ -0,0 +1,211 @@
+import functools
+import mmap
+import os
+import pathlib
+import struct
+from typing import BinaryIO
+
+import pygame
+from pygame.typing import RectLike
+
+from gamelibs import assetpack
+
+# converted surfaces saved as raw display format pixels, so later launches
+# can copy them straight into a new surface instead of decoding and converting.
+# Everything lives in one file, read through a memory map. Layout, all little endian:
+#   header: magic, version, length of the display pixel format, the pixel format
+#   records: appended one after another, each a fixed size part, then its key
+#   (source path and sub-rect), then the pixel rows exactly as laid out in memory
+CACHE_FILE = ".cache/surfaces.bin"
+MAGIC = b"SURF"
+VERSION = 2
+HEADER = struct.Struct("<4sHH")
+# key length, source mtime, width, height, pitch, colorkey
+RECORD = struct.Struct("<HdIII?4B")
+
+Entry = tuple[int, int, int, int, tuple[int, int, int, int] | None]
+# an entry and a copy of its pixels, handed from read() to decode()
+Found = tuple[Entry, bytes]
+
+
+class SurfaceCache:
+    def __init__(self, path: pathlib.Path, pack: assetpack.AssetPack | None) -> None:
+        self.path = path
+        # packed files are checked against the pack's index instead of the disk
+        self.pack = pack
+        self.stats = {"hits": 0, "misses": 0}
+        # turned off for the rest of the session once the file can't be written
+        self.enabled = True
+        self.opened = False
+        self.map: mmap.mmap | None = None
+        # key -> offset of the pixels, width, height, pitch, colorkey
+        self.entries: dict[str, Entry] = {}
+        # keys appended this session, which the map does not cover
+        self.written: set[str] = set()
+        self.file: BinaryIO | None = None
+
+    @functools.cached_property
+    def template(self) -> pygame.Surface:
+        # only usable once the window exists, new surfaces copy its pixel format
+        return pygame.Surface((1, 1)).convert()
+
+    @functools.cached_property
+    def header(self) -> bytes:
+        pixel_format = (
+            f"{self.template.get_bitsize()}:{self.template.get_masks()}".encode()
+        )
+        return HEADER.pack(MAGIC, VERSION, len(pixel_format)) + pixel_format
+
+    def key(self, path: pathlib.Path, rect: RectLike | None) -> str:
+        return f"{assetpack.pack_key(path)}|{rect}"
+
+    def source_mtime(self, path: pathlib.Path) -> float | None:
+        if self.pack is not None:
+            entry = self.pack.entries.get(assetpack.pack_key(path))
+            if entry is not None:
+                return entry[3]
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def ready(self) -> bool:
+        # opens the file on first use, since the pixel format needs the window.
+        # Main thread only, read() can then run anywhere.
+        if self.enabled and not self.opened:
+            self.open()
+        return self.enabled
+
+    def open(self) -> None:
+        # reads the whole index once, dropping entries whose source changed since
+        self.opened = True
+        try:
+            with self.path.open("rb") as file:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # missing or empty
+            self.reset()
+            return
+        if self.map[: len(self.header)] != self.header:
+            self.reset()
+            return
+        offset = len(self.header)
+        stale = 0
+        while offset + RECORD.size <= len(self.map):
+            key_length, mtime, width, height, pitch, keyed, *colorkey = (
+                RECORD.unpack_from(self.map, offset)
+            )
+            start = offset + RECORD.size + key_length
+            end = start + pitch * height
+            if end > len(self.map):
+                break
+            key = self.map[offset + RECORD.size : start].decode()
+            source = pathlib.Path(key.rpartition("|")[0])
+            if self.source_mtime(source) == mtime:
+                self.entries[key] = (
+                    start,
+                    width,
+                    height,
+                    pitch,
+                    tuple(colorkey) if keyed else None,  # type: ignore
+                )
+            else:
+                stale += end - offset
+            offset = end
+        # a record cut short by a crash, or a file that is mostly outdated
+        if offset != len(self.map) or stale * 2 > len(self.map):
+            self.reset()
+
+    def reset(self) -> None:
+        # starts the file over with just a header
+        if self.map is not None:
+            self.map.close()
+        self.map = None
+        self.entries.clear()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_bytes(self.header)
+        except OSError as error:
+            self.disable(error)
+
+    def disable(self, error: OSError) -> None:
+        print("WARNING: surface cache turned off:", error)
+        self.close()
+        self.enabled = False
+
+    def close(self) -> None:
+        # the next use opens the file again, with this session's entries indexed
+        if self.map is not None:
+            self.map.close()
+        if self.file is not None:
+            self.file.close()
+        self.map = None
+        self.file = None
+        self.entries.clear()
+        self.written.clear()
+        self.opened = False
+
+    def load(
+        self, path: pathlib.Path, rect: RectLike | None = None
+    ) -> pygame.Surface | None:
+        if not self.ready():
+            return None
+        return self.decode(self.read(path, rect))
+
+    def read(self, path: pathlib.Path, rect: RectLike | None) -> Found | None:
+        # only touches the mapped file, so it can run on another thread once ready
+        entry = self.entries.get(self.key(path, rect))
+        if entry is None or self.map is None:
+            return None
+        start, _, height, pitch, _ = entry
+        try:
+            return entry, self.map[start : start + pitch * height]
+        except ValueError:
+            # closed by the main thread in the meantime
+            return None
+
+    def decode(self, found: Found | None) -> pygame.Surface | None:
+        if found is None:
+            self.stats["misses"] += 1
+            return None
+        (_, width, height, pitch, colorkey), pixels = found
+        surface = pygame.Surface((width, height), 0, self.template)
+        if surface.get_pitch() != pitch:
+            self.stats["misses"] += 1
+            return None
+        surface.get_buffer().write(pixels)
+        if colorkey is not None:
+            surface.set_colorkey(colorkey)
+        self.stats["hits"] += 1
+        return surface
+
+    def store(
+        self, path: pathlib.Path, rect: RectLike | None, surface: pygame.Surface
+    ) -> None:
+        if not self.ready():
+            return
+        key = self.key(path, rect)
+        mtime = self.source_mtime(path)
+        if key in self.entries or key in self.written or mtime is None:
+            return
+        encoded_key = key.encode()
+        colorkey = surface.get_colorkey()
+        record = RECORD.pack(
+            len(encoded_key),
+            mtime,
+            surface.get_width(),
+            surface.get_height(),
+            surface.get_pitch(),
+            colorkey is not None,
+            *(colorkey or (0, 0, 0, 0)),
+        )
+        try:
+            if self.file is None:
+                self.file = self.path.open("ab")
+            # a crash part way through leaves a short record, which open() throws out
+            self.file.write(record + encoded_key + surface.get_buffer().raw)
+            self.file.flush()
+        except OSError as error:
+            self.disable(error)
+            return
+        self.written.add(key)
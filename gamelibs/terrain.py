@@ -0,0 +1,140 @@
+import math
+from typing import Iterable, Sequence
+
+import numpy
+import pygame
+
+from gamelibs import interfaces
+
+TILE_SIZE = 16
+# checks that merged rects cover exactly the same tiles as the mask they came from
+VALIDATE_MERGE = False
+
+
+class TileGrid:
+    def __init__(self, tiles: numpy.ndarray, tile_size: int = TILE_SIZE) -> None:
+        self.tiles = tiles.astype(numpy.uint8, copy=False)
+        self.tile_size = tile_size
+
+    @classmethod
+    def from_csv(
+        cls, rows: Sequence[Sequence[str]], tile_size: int = TILE_SIZE
+    ) -> "TileGrid":
+        return cls(numpy.array(rows, dtype=numpy.uint8), tile_size)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.tiles.shape  # type: ignore
+
+    def span(self, rect: interfaces.MiscRect) -> tuple[slice, slice]:
+        # rows and columns of every tile that a rect overlaps (touching edges don't count)
+        if rect.width <= 0 or rect.height <= 0:
+            return slice(0, 0), slice(0, 0)
+        size = self.tile_size
+        height, width = self.tiles.shape
+        left = max(0, math.floor(rect.left / size))
+        top = max(0, math.floor(rect.top / size))
+        right = min(width, math.ceil(rect.right / size))
+        bottom = min(height, math.ceil(rect.bottom / size))
+        return slice(top, max(top, bottom)), slice(left, max(left, right))
+
+    def classes_in(self, rect: interfaces.MiscRect) -> set[int]:
+        return set(numpy.unique(self.tiles[self.span(rect)]).tolist())
+
+
+class TerrainClass:
+    def __init__(self, grid: TileGrid, values: Iterable[int]) -> None:
+        self.grid = grid
+        self.values = frozenset(values)
+        self.mask = numpy.isin(grid.tiles, tuple(self.values))
+
+    def collide(self, rect: interfaces.MiscRect) -> bool:
+        return bool(self.mask[self.grid.span(rect)].any())
+
+    def sweep(
+        self,
+        rect: interfaces.MiscRect,
+        delta: float,
+        axis: interfaces.Axis,
+        one_way: bool = False,
+    ) -> float | None:
+        # edge of the first tile in the way of rect moving delta along axis.
+        # Only the tiles the leading side crosses are visited.
+        # One way tiles only block if rect started completely behind them.
+        size = self.grid.tile_size
+        rows, cols = self.grid.span(rect)
+        height, width = self.mask.shape
+        if axis == interfaces.Axis.X:
+            if rows.start == rows.stop:
+                return None
+            lines = self.mask[rows].T
+            near, far, limit = rect.left, rect.right, width
+        else:
+            if cols.start == cols.stop:
+                return None
+            lines = self.mask[:, cols]
+            near, far, limit = rect.top, rect.bottom, height
+        if delta >= 0:
+            start = max(0, math.ceil(far / size) - (not one_way))
+            end = min(limit - 1, math.ceil((far + delta) / size) - 1)
+            for line in range(start, end + 1):
+                if lines[line].any():
+                    return line * size
+        else:
+            start = min(limit - 1, math.floor(near / size) - one_way)
+            end = max(0, math.floor((near + delta) / size))
+            for line in range(start, end - 1, -1):
+                if lines[line].any():
+                    return (line + 1) * size
+        return None
+
+    def rects(self, vertical: bool = True) -> list[pygame.FRect]:
+        return merge_tiles(self.mask, self.grid.tile_size, vertical)
+
+
+def merge_tiles(
+    mask: numpy.ndarray, tile_size: int = TILE_SIZE, vertical: bool = True
+) -> list[pygame.FRect]:
+    # greedy meshing: find runs of tiles in each row, then grow them downwards
+    # while the row below has a run with the exact same columns
+    rects: list[pygame.FRect] = []
+    open_runs: dict[tuple[int, int], pygame.FRect] = {}
+    for row, line in enumerate(mask.tolist()):
+        runs: dict[tuple[int, int], pygame.FRect] = {}
+        col = 0
+        width = len(line)
+        while col < width:
+            if not line[col]:
+                col += 1
+                continue
+            start = col
+            while col < width and line[col]:
+                col += 1
+            run = (start, col)
+            if vertical and run in open_runs:
+                rect = open_runs.pop(run)
+                rect.height += tile_size
+            else:
+                rect = pygame.FRect(
+                    start * tile_size,
+                    row * tile_size,
+                    (col - start) * tile_size,
+                    tile_size,
+                )
+                rects.append(rect)
+            runs[run] = rect
+        open_runs = runs
+    if VALIDATE_MERGE:
+        assert validate_merge(mask, rects, tile_size), "Merged rects do not match tiles"
+    return rects
+
+
+def validate_merge(
+    mask: numpy.ndarray, rects: Iterable[pygame.FRect], tile_size: int = TILE_SIZE
+) -> bool:
+    coverage = numpy.zeros(mask.shape, numpy.uint16)
+    for rect in rects:
+        top, left = int(rect.top) // tile_size, int(rect.left) // tile_size
+        bottom, right = int(rect.bottom) // tile_size, int(rect.right) // tile_size
+        coverage[top:bottom, left:right] += 1
+    return bool((coverage == mask).all())
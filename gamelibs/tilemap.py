@@ -0,0 +1,168 @@
+from typing import Iterable, Iterator
+
+import pygame
+from pygame.typing import ColorLike, Point, RectLike
+
+from gamelibs import hardware, interfaces, sprite
+from gamelibs.interfaces import FileID
+
+CHUNK_SIZE = 128
+
+
+class TileChunk(sprite.Sprite):
+    # one piece of a layer stack.
+    # The chunk keeps its own cut of each layer until it is first drawn,
+    # then only the composited and converted image.
+    static = True
+
+    def __init__(
+        self,
+        level: interfaces.Level,
+        stack: "LayerStack",
+        rect: RectLike,
+        z: int = 0,
+        placeholder: pygame.Surface | None = None,
+        pieces: list[tuple[pygame.Surface, Point]] | None = None,
+    ) -> None:
+        rect = pygame.Rect(rect)
+        # view of a shared blank surface so the chunk has a size before it is drawn
+        if placeholder is None:
+            placeholder = pygame.Surface(rect.size, 0, 8)
+        super().__init__(level, placeholder.subsurface((0, 0), rect.size), rect, z)
+        self.stack = stack
+        self.area = rect
+        self.pieces = pieces or []
+        self.converted: pygame.Surface | None = None
+
+    @property
+    def to_draw(self) -> pygame.Surface:
+        if self.converted is None:
+            self.converted = self.stack.composite(self.area, self.pieces)
+            self.pieces = []
+        return self.converted
+
+    @to_draw.setter
+    def to_draw(self, value: pygame.Surface) -> None:
+        self.converted = value
+
+    def mark_dirty(self, pieces: list[tuple[pygame.Surface, Point]]) -> None:
+        self.pieces = pieces
+        self.converted = None
+
+    def update(self, dt: float) -> bool:
+        # layers never change by themselves, so skip the per frame image copy
+        return not self.dead
+
+
+class LayerStack:
+    # map layers with no sprites between them, flattened into one image per chunk.
+    # Without a fill color the chunks are colorkeyed so backgrounds show through.
+    # The full layer images are only held until split() has cut them up.
+    def __init__(
+        self,
+        level: interfaces.Level,
+        images: Iterable[pygame.Surface],
+        z: int = 0,
+        fill: ColorLike | None = None,
+        paths: Iterable[FileID] = (),
+    ) -> None:
+        self.level = level
+        self.images = list(images)
+        self.z = z
+        self.fill = fill
+        # where the images came from, so dirty chunks can be cut again
+        self.paths = list(paths)
+        self.chunks: list[TileChunk] = []
+
+    @classmethod
+    def load(
+        cls,
+        level: interfaces.Level,
+        paths: Iterable[FileID],
+        z: int = 0,
+        fill: ColorLike | None = None,
+    ) -> "LayerStack":
+        paths = list(paths)
+        return cls(
+            level, (hardware.loader.load_image(path) for path in paths), z, fill, paths
+        )
+
+    def cut(self, area: pygame.Rect) -> list[tuple[pygame.Surface, Point]]:
+        # copies of the layer pixels inside area, and where they go in the chunk
+        pieces: list[tuple[pygame.Surface, Point]] = []
+        for image in self.images:
+            clipped = area.clip(image.get_rect())
+            if clipped:
+                pieces.append(
+                    (
+                        image.subsurface(clipped).copy(),
+                        (clipped.left - area.left, clipped.top - area.top),
+                    )
+                )
+        return pieces
+
+    def split(self, chunk_size: int = CHUNK_SIZE) -> Iterator[TileChunk]:
+        if not self.images:
+            return
+        size_rect = self.images[0].get_rect()
+        for image in self.images[1:]:
+            size_rect.union_ip(image.get_rect())
+        placeholder = pygame.Surface((chunk_size, chunk_size), 0, 8)
+        for top in range(0, size_rect.height, chunk_size):
+            for left in range(0, size_rect.width, chunk_size):
+                area = pygame.Rect(left, top, chunk_size, chunk_size)
+                # trim each chunk down to its visible pixels, skip it if there are none
+                bounds = pygame.Rect(area.topleft, (0, 0))
+                for image in self.images:
+                    clipped = area.clip(image.get_rect())
+                    image_bounds = (
+                        image.subsurface(clipped)
+                        .get_bounding_rect()
+                        .move(clipped.topleft)
+                    )
+                    if image_bounds:
+                        bounds = bounds.union(image_bounds) if bounds else image_bounds
+                if not bounds:
+                    continue
+                chunk = TileChunk(
+                    self.level, self, bounds, self.z, placeholder, self.cut(bounds)
+                )
+                self.chunks.append(chunk)
+                yield chunk
+        self.images = []
+
+    def composite(
+        self, area: pygame.Rect, pieces: list[tuple[pygame.Surface, Point]]
+    ) -> pygame.Surface:
+        if self.fill is None:
+            surface = hardware.loader.create_surface(area.size)
+        else:
+            surface = pygame.Surface(area.size).convert()
+            surface.fill(self.fill)
+        surface.fblits(pieces)
+        return surface
+
+    def memory_estimate(self) -> int:
+        surfaces = [*self.images]
+        for chunk in self.chunks:
+            surfaces.extend(piece for piece, _ in chunk.pieces)
+            if chunk.converted is not None:
+                surfaces.append(chunk.converted)
+        return sum(
+            surface.get_width() * surface.get_height() * surface.get_bytesize()
+            for surface in surfaces
+        )
+
+    def mark_dirty(self, rect: RectLike | None = None) -> None:
+        # the layer files are read again and cut up for the chunks that changed
+        chunks = [
+            chunk
+            for chunk in self.chunks
+            if rect is None or chunk.rect.colliderect(rect)
+        ]
+        if not chunks or not self.paths:
+            return
+        self.images = [hardware.loader.load_image(path) for path in self.paths]
+        for chunk in chunks:
+            chunk.mark_dirty(self.cut(chunk.area))
+        self.images = []
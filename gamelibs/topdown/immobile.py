@@ -39,6 +39,7 @@ class Interactable(sprite.Sprite, interfaces.Interactor):
 
 class Ship(Interactable, interfaces.Collider):
     groups = {"interactable", "static-collision"}
+    static = True
 
     def __init__(
         self,
@@ -65,6 +66,7 @@ class Ship(Interactable, interfaces.Collider):
 
 class BrokenShip(Interactable, interfaces.Collider):
     groups = {"interactable", "static-collision"}
+    static = True
 
     def __init__(
         self,
@@ -91,6 +93,7 @@ class BrokenShip(Interactable, interfaces.Collider):
 
 class House(Interactable, interfaces.Collider):
     groups = {"static-collision", "interactable"}
+    static = True
 
     def __init__(
         self,
@@ -146,6 +149,7 @@ class House(Interactable, interfaces.Collider):
 
 class Smith(Interactable, interfaces.Collider):
     groups = {"static-collision", "interactable"}
+    static = True
 
     def __init__(
         self,
@@ -246,6 +250,9 @@ class Furniture(Interactable, interfaces.Collider):
 
 class Bush(sprite.Sprite):
     groups = {"static-collision"}
+    static = True
+    # nothing to do but redraw its image, so it sleeps as soon as it can't be seen
+    wake_margin = 0
 
     def __init__(
         self,
@@ -303,6 +310,7 @@ class Spikefruit(sprite.Sprite, interfaces.Interactor):
 
 class WaspberryBush(sprite.Sprite, interfaces.Collider):
     groups = {"static-collision"}
+    static = True
 
     def __init__(
         self,
@@ -388,6 +396,7 @@ class Spapple(sprite.Sprite, interfaces.Interactor):
 
 class Hoverboard(sprite.Sprite, interfaces.Interactor):
     groups = {"interactable"}
+    always_active = True
 
     def __init__(
         self,
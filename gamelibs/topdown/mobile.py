@@ -1,16 +1,43 @@
 from math import sin
 import random
-from typing import Any, Iterator
+import struct
+from typing import Any
 
 import pygame
 from pygame.typing import RectLike, Point
 
-from gamelibs import sprite, projectile, timer, visual_fx, interfaces, hardware
+from gamelibs import (
+    sprite,
+    projectile,
+    timer,
+    visual_fx,
+    interfaces,
+    hardware,
+    spatial,
+)
 from gamelibs.animation import Animation, SingleAnimation, NoLoopAnimation
 
 WALK_SPEED = 64
 BOARD_SPEED = 96
 FALL_SPEED = 128
+SEARCH_MARGIN = 64
+
+
+def neighbour_name(name: interfaces.FileID, direction: interfaces.Direction) -> str:
+    # maps are named after their planet plus one suffix per map away from it
+    long_name = f"{name}_{direction}"
+    x = long_name.count("right") - long_name.count("left")
+    y = long_name.count("down") - long_name.count("up")
+    short_name = str(name).split("_")[0]
+    if x < 0:
+        short_name += "_left" * abs(x)
+    if x > 0:
+        short_name += "_right" * x
+    if y < 0:
+        short_name += "_up" * abs(y)
+    if y > 0:
+        short_name += "_down" * y
+    return short_name
 
 
 class PhysicsSprite(sprite.Sprite, interfaces.Collider, interfaces.Turner):
@@ -48,18 +75,62 @@ class PhysicsSprite(sprite.Sprite, interfaces.Collider, interfaces.Turner):
     def on_map_departure(self, directions: list[interfaces.Direction]) -> None:
         pass
 
+    def query_collision(self, area: interfaces.MiscRect) -> list[interfaces.MiscRect]:
+        level = self.get_level()
+        rects: list[interfaces.MiscRect] = []
+        for group in self.collision_groups:
+            rects.extend(level.query_rects(group, area))
+        return rects
+
+    def move_axis(
+        self,
+        delta: float,
+        axis: interfaces.Axis,
+        rects: list[interfaces.MiscRect],
+    ) -> None:
+        # anything already overlapping is left for depenetration to deal with
+        before = self.collision_rect
+        blockers = [rect for rect in rects if not before.colliderect(rect)]
+        if axis == interfaces.Axis.X:
+            self.rect.x += delta
+        else:
+            self.rect.y += delta
+        after = self.collision_rect
+        hits = [blockers[i] for i in after.collidelistall(blockers)]  # type: ignore
+        if not hits:
+            return
+        self.on_xy_collision()
+        if axis == interfaces.Axis.X and delta > 0:
+            self.rect.x += min(hit.left for hit in hits) - after.right
+        elif axis == interfaces.Axis.X:
+            self.rect.x += max(hit.right for hit in hits) - after.left
+        elif delta > 0:
+            self.rect.y += min(hit.top for hit in hits) - after.bottom
+        else:
+            self.rect.y += max(hit.bottom for hit in hits) - after.top
+
     def update(self, dt: float) -> bool:
         # physics
+        level = self.get_level()
         vel = self.velocity * dt * (not self.locked)
-        self.rect.clamp_ip(self.get_level().map_rect)
-        self.rect.center += vel
+        self.rect.clamp_ip(level.map_rect)
         departure_directions: list[interfaces.Direction] = []
-        iterator = search(self.pos)
-        collision_rects: list[interfaces.MiscRect] = []
-        for group in self.collision_groups:
-            collision_rects.extend(self.get_level().get_rects(group))
-        while self.collision_rect.collidelist(collision_rects) >= 0:
-            self.rect.center = next(iterator)
+        search_area = (
+            self.collision_rect.move(vel)
+            .union(self.collision_rect)
+            .inflate(SEARCH_MARGIN, SEARCH_MARGIN)
+        )
+        collision_rects = self.query_collision(search_area)
+        if vel.x:
+            self.move_axis(vel.x, interfaces.Axis.X, collision_rects)
+        if vel.y:
+            self.move_axis(vel.y, interfaces.Axis.Y, collision_rects)
+        if self.collision_rect.collidelist(collision_rects) >= 0:  # type: ignore
+            offset = spatial.depenetrate(
+                self.collision_rect, self.query_collision, level.map_rect
+            )
+            if offset is not None:
+                self.rect.topleft += offset
         if self.rect.top < self.get_level().map_rect.top:
             departure_directions.append(interfaces.Direction.UP)
         if self.rect.bottom > self.get_level().map_rect.bottom:
@@ -75,6 +146,7 @@ class PhysicsSprite(sprite.Sprite, interfaces.Collider, interfaces.Turner):
 
 class Player(PhysicsSprite, interfaces.Player):
     groups = {"player", *PhysicsSprite.groups}
+    always_active = True
 
     def __init__(
         self,
@@ -164,20 +236,10 @@ class Player(PhysicsSprite, interfaces.Player):
 
     def on_map_departure(self, directions: list[interfaces.Direction]) -> None:
         if self.get_level().map_type != interfaces.MapType.HOUSE:
-            long_name = f"{self.get_level().name}_{directions[0]}"
-            x = long_name.count("right") - long_name.count("left")
-            y = long_name.count("down") - long_name.count("up")
-            short_name = str(self.get_level().name).split("_")[0]
-            if x < 0:
-                short_name += "_left" * abs(x)
-            if x > 0:
-                short_name += "_right" * x
-            if y < 0:
-                short_name += "_up" * abs(y)
-            if y > 0:
-                short_name += "_down" * y
             self.get_game().switch_level(
-                short_name, direction=directions[0], position=self.pos
+                neighbour_name(self.get_level().name, directions[0]),
+                direction=directions[0],
+                position=self.pos,
             )
         else:
             self.get_game().run_cutscene("level_exit")
@@ -201,11 +263,12 @@ class Player(PhysicsSprite, interfaces.Player):
             self.image = self.anim_dict[f"{self.state}-{self.facing}"].image
 
     def interact(self) -> interfaces.InteractionResult:
-        for sprite in self.get_level().get_group("interactable"):
-            if sprite.collision_rect.colliderect(self.interaction_rect):  # type: ignore
-                print("interact w/", sprite)
-                if sprite.interact() == interfaces.InteractionResult.NO_MORE:  # type: ignore
-                    return interfaces.InteractionResult.MORE
+        for sprite in self.get_level().query_group(
+            "interactable", self.interaction_rect
+        ):
+            print("interact w/", sprite)
+            if sprite.interact() == interfaces.InteractionResult.NO_MORE:  # type: ignore
+                return interfaces.InteractionResult.MORE
         return interfaces.InteractionResult.FAILED
 
     def update(self, dt: float) -> bool:
@@ -277,6 +340,14 @@ class Player(PhysicsSprite, interfaces.Player):
     def charge(self, emeralds: int) -> None:
         self.emeralds = max(0, self.emeralds - emeralds)
 
+    def snapshot_state(self) -> bytes:
+        facing = list(interfaces.Direction).index(self.last_facing)
+        return struct.pack("<B", facing) + self.state.encode()
+
+    def restore_state(self, state: bytes) -> None:
+        self.last_facing = list(interfaces.Direction)[state[0]]
+        self.state = state[1:].decode()
+
     def walk_left(self) -> None:
         self.desired_velocity.x -= WALK_SPEED
 
@@ -292,6 +363,7 @@ class Player(PhysicsSprite, interfaces.Player):
 
 class Iball(sprite.Sprite):
     SPEED = 32
+    always_active = True
 
     def __init__(
         self,
@@ -364,6 +436,8 @@ class Iball(sprite.Sprite):
 
 class Drone(sprite.Sprite, interfaces.Healthy):
     groups = {"hurtable"}
+    # flies in from far above its spawn point, then follows the player around
+    always_active = True
     SPEED = 32
     FALL_SPEED = 256
     MAX_HEALTH = 2
@@ -416,6 +490,18 @@ class Drone(sprite.Sprite, interfaces.Healthy):
         self.offset = random.randint(-16, 16)
         self.pos_cycle = timer.Timer(2500)
 
+    def snapshot_state(self) -> bytes:
+        return (
+            struct.pack("<4fb", *self.true_pos, *self.dest, self.health)
+            + self.state.encode()
+        )
+
+    def restore_state(self, state: bytes) -> None:
+        x, y, dest_x, dest_y, self.health = struct.unpack_from("<4fb", state)
+        self.true_pos.update(x, y)
+        self.dest.update(dest_x, dest_y)
+        self.state = state[struct.calcsize("<4fb") :].decode()
+
     def hurt(self, amount: int) -> None:
         if self.pain_cooldown.done():
             self.pain_cooldown.reset()
@@ -481,6 +567,8 @@ class Drone(sprite.Sprite, interfaces.Healthy):
 
 
 class TumbleFish(sprite.Sprite):
+    # starts rolling once the player is within 96 pixels below it
+    wake_margin = 96
     ROLL_SPEED = 96
     MOUNTAIN_ROLL_SPEED = 128
 
@@ -531,21 +619,16 @@ class TumbleFish(sprite.Sprite):
             self.base_frames["prep"].update(dt)
         elif self.state == "rolling":
             speed = self.ROLL_SPEED
-            if self.rect.collidelist(self.get_level().get_rects("mountain")) != -1:
+            if self.get_level().collide_terrain("mountain", self.rect):
                 speed = self.MOUNTAIN_ROLL_SPEED
             self.rect.y += speed * dt
             self.image = self.base_frames["rolling"].image
             self.base_frames["rolling"].update(dt)
-            if (
-                self.hit_chasm
-                and self.rect.collidelist(self.get_level().get_rects("ground")) == -1
-            ):
+            terrain_classes = self.get_level().get_terrain_classes(self.rect)
+            if self.hit_chasm and "ground" not in terrain_classes:
                 self.get_level().add_death_animation(self.rect.center)
                 return False
-            if (
-                not self.hit_chasm
-                and self.rect.collidelist(self.get_level().get_rects("chasm")) != -1
-            ):
+            if not self.hit_chasm and "chasm" in terrain_classes:
                 self.hit_chasm = True
         if self.rect.colliderect(self.get_player().collision_rect):
             self.get_player().hurt(2)
@@ -554,6 +637,8 @@ class TumbleFish(sprite.Sprite):
 
 
 class DeadPlayer(sprite.Sprite):
+    always_active = True
+
     def __init__(
         self,
         level: interfaces.Level,
@@ -570,31 +655,3 @@ class DeadPlayer(sprite.Sprite):
         self.anim.update(dt)
         self.image = self.anim.image
         return super().update(dt)
-
-
-def search(start: Point) -> Iterator[tuple[int, int]]:
-    """yields positions in a grid of spacing 'dist', in order of rough proximity to 'start'"""
-
-    def neighbors(
-        position: tuple[int, int],
-    ) -> tuple[tuple[int, int], tuple[int, int], tuple[int, int], tuple[int, int]]:
-        return (
-            (position[0], position[1] - 1),
-            (position[0] + 1, position[1]),
-            (position[0], position[1] + 1),
-            (position[0] - 1, position[1]),
-        )
-
-    # breadth first search (https://www.redblobgames.com/pathfinding/a-star/introduction.html)
-    frontier: list[tuple[int, int]] = list()
-    start = (int(start[0]), int(start[1]))
-    frontier.append(start)
-    reached: set[tuple[int, int]] = set()
-    reached.add(start)
-    while True:
-        current = frontier.pop(0)
-        for next in neighbors(current):
-            if next not in reached:
-                frontier.append(next)
-                reached.add(next)
-        yield current
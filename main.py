@@ -49,6 +49,9 @@ class Game(interfaces.Game):
         self.context: zengl.Context
         self.just_ran_cutscene = False
         self.running_cutscenes: dict[str, asyncio.Task[Any]] = {}
+        # how far along the current map load is, from 0 to 1
+        self.loading: float = 1
+        self.level_cache = level.LevelCache()
 
     def pop_state(self) -> None:
         self._stack.popleft().on_pop()
@@ -130,12 +133,67 @@ class Game(interfaces.Game):
         entrance: interfaces.MapEntranceType = interfaces.MapEntranceType.NORMAL,
     ) -> None:
         print("loading level:", map_name)
-        new_map = level.Level.load(self, map_name, direction, position, entrance)
-        if (
-            isinstance(self.get_state(), level.Level)
-            and new_map.map_type != interfaces.MapType.HOUSE
-        ):
-            self.pop_state()
+        new_map = self.cached_map(map_name, direction, position, entrance)
+        if new_map is None:
+            new_map = level.Level.load(self, map_name, direction, position, entrance)
+        self.enter_map(map_name, new_map)
+
+    def cached_map(
+        self,
+        map_name: interfaces.FileID,
+        direction: interfaces.Direction | None = None,
+        position: Point | None = None,
+        entrance: interfaces.MapEntranceType = interfaces.MapEntranceType.NORMAL,
+    ) -> level.Level | None:
+        # special entrances place the player themselves, so those maps are rebuilt
+        if entrance != interfaces.MapEntranceType.NORMAL:
+            return None
+        new_map = self.level_cache.take(map_name)
+        if new_map is not None:
+            print("reusing cached level:", map_name, self.level_cache.stats)
+            new_map.resume(direction, position)
+        return new_map
+
+    async def load_map_async(
+        self,
+        map_name: interfaces.FileID,
+        direction: interfaces.Direction | None = None,
+        position: Point | None = None,
+        entrance: interfaces.MapEntranceType = interfaces.MapEntranceType.NORMAL,
+    ) -> None:
+        print("loading level:", map_name)
+        new_map = self.cached_map(map_name, direction, position, entrance)
+        if new_map is None:
+            self.loading = 0
+            new_map = await level.Level.load_async(
+                self,
+                map_name,
+                direction,
+                position,
+                entrance,
+                on_progress=lambda progress: setattr(self, "loading", progress),
+            )
+            self.loading = 1
+        self.enter_map(map_name, new_map)
+
+    def prefetch_map(self, map_name: interfaces.FileID) -> None:
+        # starts reading a map's files so a following load_map_async has less to do
+        if map_name not in self.level_cache.levels:
+            generation = hardware.loader.preload_generation
+            hardware.loader.run_in_background(
+                lambda: level.Level.prefetch(map_name, generation)
+            )
+
+    def enter_map(self, map_name: interfaces.FileID, new_map: level.Level) -> None:
+        current = self.get_state()
+        if isinstance(current, level.Level):
+            # the switch cutscene keeps the old level locked and painted over
+            # until the new one is ready
+            current.unlock()
+            current.clear_effects()
+            if new_map.map_type != interfaces.MapType.HOUSE:
+                self.level_cache.put(current)
+                self.pop_state()
         self.push_state(new_map)
         if "_" not in map_name:
             hardware.save.set_state("planet", map_name)
@@ -263,6 +321,7 @@ class Game(interfaces.Game):
             self.draw()
             dt = self.update(dt)
             await asyncio.sleep(0)
+        hardware.loader.flush()
         pygame.quit()
 
     def save_to_disk(self) -> None:
@@ -270,6 +329,8 @@ class Game(interfaces.Game):
 
     def quit(self) -> None:
         print(hardware.settings)
+        print("asset caches:", hardware.loader.cache_report())
+        self.level_cache.clear()
         hardware.loader.save_settings(hardware.settings)
         hardware.loader.flush()
         self._stack.clear()
@@ -0,0 +1,34 @@
+# times Level.snapshot and Level.restore on every map but the hoverboard runs,
+# which retry by loading again. Run with `python tests/bench_snapshot.py`.
+import json
+import pathlib
+import timeit
+
+from fake_game import load_level
+from gamelibs import interfaces
+
+RUNS = 100
+
+
+def main() -> None:
+    for folder in sorted(pathlib.Path("assets/ldtk/simplified").iterdir()):
+        data = json.loads((folder / "data.json").read_text())
+        if data["customFields"]["Maptype"] == interfaces.MapType.HOVERBOARD:
+            continue
+        current = load_level(folder.name)
+        while current.pending_spawns:
+            current.update(0)
+        current.update(0)
+        blob = current.snapshot()
+        snapshot_time = timeit.timeit(current.snapshot, number=RUNS) / RUNS
+        restore_time = timeit.timeit(lambda: current.restore(blob), number=RUNS) / RUNS
+        print(
+            f"{folder.name:<24} {len(current.spawn_fields):>4} entities"
+            f" {len(blob):>7} bytes"
+            f" snapshot {snapshot_time * 1000:.3f} ms"
+            f" restore {restore_time * 1000:.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# file formats that only need pygame, so these run without SNEK2
+import gc
+import os
+import pathlib
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import pytest
+
+from gamelibs import assetpack, atlas, snapshot, surfacecache
+
+pygame.init()
+pygame.display.set_mode((16, 16))
+
+
+@pytest.fixture
+def game_folder(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> pathlib.Path:
+    (tmp_path / "assets").mkdir()
+    image = pygame.Surface((5, 7))
+    image.fill((1, 2, 3))
+    pygame.image.save(image, tmp_path / "assets" / "a.png")
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "b.json").write_text("{}")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_pack_reads_what_was_packed(game_folder: pathlib.Path) -> None:
+    assert assetpack.build(pathlib.Path("."), pathlib.Path("assets.pack")) == 2
+    pack = assetpack.AssetPack.open(pathlib.Path("assets.pack"))
+    assert pack is not None
+    assert bytes(pack.read(pathlib.Path("data/b.json"))) == b"{}"  # type: ignore
+    assert pack.read(pathlib.Path("data/missing.json")) is None
+
+
+def test_pack_drops_edited_files_only_when_asked(game_folder: pathlib.Path) -> None:
+    assetpack.build(pathlib.Path("."), pathlib.Path("assets.pack"))
+    os.utime("data/b.json", (1, 1))
+    pack = assetpack.AssetPack.open(pathlib.Path("assets.pack"))
+    assert pack is not None and "data/b.json" in pack.entries
+    pack = assetpack.AssetPack.open(pathlib.Path("assets.pack"), check_stale=True)
+    assert pack is not None and "data/b.json" not in pack.entries
+
+
+@pytest.mark.parametrize("keep", [0, 3, 20, -1])
+def test_truncated_pack_is_not_used(game_folder: pathlib.Path, keep: int) -> None:
+    path = pathlib.Path("assets.pack")
+    assetpack.build(pathlib.Path("."), path)
+    path.write_bytes(path.read_bytes()[:keep])
+    assert assetpack.AssetPack.open(path) is None
+
+
+def test_surface_cache_round_trip(game_folder: pathlib.Path) -> None:
+    source = pathlib.Path("assets/a.png")
+    surface = pygame.image.load(source).convert()
+    surface.set_colorkey((1, 2, 3))
+    cache = surfacecache.SurfaceCache(pathlib.Path(".cache/surfaces.bin"), None)
+    assert cache.load(source) is None
+    cache.store(source, None, surface)
+    cache.close()
+    loaded = cache.load(source)
+    assert loaded is not None
+    assert loaded.get_size() == surface.get_size()
+    assert loaded.get_colorkey() == surface.get_colorkey()
+    # an edited source is not served from the cache
+    cache.close()
+    os.utime(source, (1, 1))
+    assert cache.load(source) is None
+
+
+def test_surface_cache_turns_off_once(
+    game_folder: pathlib.Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    pathlib.Path("blocked").write_text("")
+    source = pathlib.Path("assets/a.png")
+    surface = pygame.image.load(source).convert()
+    cache = surfacecache.SurfaceCache(pathlib.Path("blocked/surfaces.bin"), None)
+    for _ in range(3):
+        cache.load(source)
+        cache.store(source, None, surface)
+    assert not cache.enabled
+    assert capsys.readouterr().out.count("WARNING") == 1
+
+
+def test_snapshot_round_trip() -> None:
+    records: list[snapshot.Record] = [
+        (None, pygame.FRect(0, 0, 16, 16), pygame.FRect(4, 4, 16, 16), 2, {}, b"x"),
+        (
+            "Emerald",
+            pygame.FRect(1, 2, 3, 4),
+            pygame.FRect(5, 6, 7, 8),
+            1,
+            {"a": 1},
+            b"",
+        ),
+    ]
+    assert list(snapshot.load(snapshot.dump(records))) == records
+
+
+def test_atlas_shares_identical_frames_and_frees_unused_ones() -> None:
+    packed = atlas.Atlas(lambda size: pygame.Surface(size))
+    frame = pygame.Surface((4, 4))
+    frames = packed.add_all([frame, frame.copy()])
+    assert packed.report()["unique_frames"] == 1
+    assert packed.uv_rect(frames[0]) == packed.uv_rect(frames[1])
+    del frames
+    gc.collect()
+    assert packed.report()["frames"] == 0
@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+
+# gamelibs.interfaces imports SNEK2, so anything that loads a level needs it
+pytest.importorskip("SNEK2")
+
+import fake_game  # sets up pygame and the working folder
+from gamelibs import hardware, level
+
+
+def test_prefetch_forgotten_while_running_keeps_nothing() -> None:
+    loader = hardware.loader
+    loader.forget_preloaded()
+    started = threading.Event()
+    release = threading.Event()
+    generation = loader.preload_generation
+
+    def job() -> None:
+        started.set()
+        release.wait()
+        level.Level.prefetch("GeminiII", generation)
+
+    future = loader.run_in_background(job)
+    assert future is not None
+    started.wait()
+    # the player has moved on before the prefetch got to store anything
+    loader.forget_preloaded()
+    release.set()
+    future.result()
+    assert not loader.preloaded
+
+
+def test_prefetch_keeps_images_until_forgotten() -> None:
+    loader = hardware.loader
+    loader.forget_preloaded()
+    level.Level.prefetch("GeminiII", loader.preload_generation)
+    assert loader.preloaded
+    loader.forget_preloaded()
+    assert not loader.preloaded
@@ -0,0 +1,62 @@
+import pytest
+
+# gamelibs.interfaces imports SNEK2, so anything that loads a level needs it
+pytest.importorskip("SNEK2")
+
+import pygame
+
+from fake_game import load_level
+from gamelibs import hardware, level
+
+
+def spawned_names(current: level.Level) -> list[str]:
+    return sorted(name for name, *_ in current.spawn_fields.values())
+
+
+# both maps have sprites whose restore_state needs a non empty state
+@pytest.mark.parametrize("name", ["Keergan_right", "GeminiI"])
+def test_retry_restores_checkpoint(name: str) -> None:
+    current = load_level(name)
+    # the checkpoint is taken before any entity has been spawned
+    assert current.pending_spawns
+    while current.pending_spawns:
+        current.update(0)
+    expected = spawned_names(current)
+    hardware.save.set_state("emeralds", 0)
+    current.player.health = 1
+    current.retry()
+    while current.pending_spawns:
+        current.update(0)
+    assert spawned_names(current) == expected
+    assert hardware.save.get_state("emeralds") == 3
+    assert current.player.health == current.player.max_health
+
+
+def test_retry_keeps_what_level_begin_spawned() -> None:
+    current = load_level("GeminiI")
+    # level_begin ends by saving a checkpoint, after the map's cutscene spawned things
+    current.spawn("Emerald", pygame.FRect(64, 64, 16, 16), current.entity_layer)
+    current.save_checkpoint()
+    expected = sorted(
+        spawned_names(current) + [name for name, *_ in current.pending_spawns]
+    )
+    current.retry()
+    while current.pending_spawns:
+        current.update(0)
+    assert spawned_names(current) == expected
+
+
+def test_retry_does_not_duplicate_spawned_children() -> None:
+    # each WaspberryBush spawns its own waspberries when it is created
+    current = load_level("GeminiII_left_left_left")
+    while current.pending_spawns:
+        current.update(0)
+    # the map's start point is inside a saline strip, which must not push it off the map
+    assert not current.get_game().switches  # type: ignore
+    expected = spawned_names(current)
+    assert "Waspberry" in expected
+    current.save_checkpoint()
+    current.retry()
+    while current.pending_spawns:
+        current.update(0)
+    assert spawned_names(current) == expected
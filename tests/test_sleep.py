@@ -0,0 +1,23 @@
+import pytest
+
+# gamelibs.interfaces imports SNEK2, so anything that loads a level needs it
+pytest.importorskip("SNEK2")
+
+from fake_game import load_level
+from gamelibs.topdown import mobile
+
+
+def test_drones_land_from_off_screen() -> None:
+    current = load_level("GeminiI")
+    while current.pending_spawns:
+        current.update(0)
+    drones = [
+        sprite for sprite in current.spawn_fields if isinstance(sprite, mobile.Drone)
+    ]
+    assert drones
+    # drones start a map's height above their spawn point, far outside the screen
+    for _ in range(600):
+        current.update(1 / 60)
+        if all(drone.state != "descent" for drone in drones):
+            break
+    assert all(drone.state != "descent" for drone in drones)